@@ -0,0 +1,153 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from shell_core import ShellCore
+from vfs import VirtualFS, DEFAULT_CACHE_SIZE
+
+
+# Образ ФС и имя хоста рабочего процесса. При запуске через fork образ
+# загружается один раз в родителе и наследуется рабочими копированием при записи.
+_IMAGE = None
+_HOSTNAME = None
+
+
+def _can_fork():
+    """Можно ли запускать рабочие через fork.
+
+    На macOS fork небезопасен для процессов, загрузивших системные
+    библиотеки (Tk, Objective-C), поэтому там используется способ запуска
+    по умолчанию, как и на платформах без fork.
+    """
+    return sys.platform != "darwin" and "fork" in multiprocessing.get_all_start_methods()
+
+
+def _init_worker(zip_path, hostname, cache_size, inherited):
+    """Готовит рабочий процесс: переоткрывает унаследованный образ или загружает свой."""
+    global _IMAGE, _HOSTNAME
+    _HOSTNAME = hostname
+    if inherited:
+        _IMAGE.reopen()
+    else:
+        _IMAGE = VirtualFS.from_zip(zip_path, cache_size)
+
+
+def _run_script(script_path):
+    """Выполняет один скрипт в отдельном ShellCore со своей текущей директорией."""
+    core = ShellCore(_HOSTNAME, _IMAGE)
+    start = time.perf_counter()
+    try:
+        with open(script_path, 'r') as script:
+            output = list(core.run_script(script))
+        error = None
+    except Exception as e:
+        output = []
+        error = str(e)
+    return {
+        "script": script_path,
+        "output": "\n".join(output),
+        "commands": core.command_count,
+        "elapsed": time.perf_counter() - start,
+        "error": error,
+    }
+
+
+def run_batch(zip_path, script_paths, hostname="batch", workers=None, cache_size=DEFAULT_CACHE_SIZE):
+    """Выполняет скрипты параллельно в пуле процессов над общим образом ФС.
+
+    Возвращает список результатов по скриптам (в порядке script_paths)
+    и словарь со статистикой пропускной способности.
+    """
+    global _IMAGE, _HOSTNAME
+    start = time.perf_counter()
+
+    inherited = _can_fork()
+    if inherited:
+        _IMAGE = VirtualFS.from_zip(zip_path, cache_size)
+        _HOSTNAME = hostname
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    load_time = time.perf_counter() - start
+
+    # Скрипты раздаются пачками, чтобы не платить за IPC на каждый короткий скрипт
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(script_paths) // (workers * 4))
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(zip_path, hostname, cache_size, inherited)) as executor:
+            results = list(executor.map(_run_script, script_paths, chunksize=chunksize))
+    finally:
+        if inherited:
+            _IMAGE.close()
+            _IMAGE = None
+
+    elapsed = time.perf_counter() - start
+    commands = sum(result["commands"] for result in results)
+    stats = {
+        "scripts": len(results),
+        "commands": commands,
+        "errors": sum(1 for result in results if result["error"]),
+        "load_time": load_time,
+        "elapsed": elapsed,
+        "scripts_per_sec": len(results) / elapsed if elapsed else 0.0,
+        "commands_per_sec": commands / elapsed if elapsed else 0.0,
+    }
+    return results, stats
+
+
+def collect_scripts(patterns):
+    """Раскрывает пути, каталоги и glob-шаблоны в отсортированный список скриптов."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(os.path.join(pattern, name) for name in sorted(os.listdir(pattern)))
+        else:
+            paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return paths
+
+
+def output_paths(script_paths, output_dir):
+    """Пути файлов вывода: путь скрипта относительно общего каталога входных скриптов + .out.
+
+    Структура каталогов повторяется в output_dir, поэтому одноименные
+    скрипты из разных каталогов (dir1/script.txt, dir2/script.txt) не
+    перезаписывают вывод друг друга.
+    """
+    if not script_paths:
+        return []
+    absolute = [os.path.abspath(path) for path in script_paths]
+    root = os.path.commonpath([os.path.dirname(path) for path in absolute])
+    return [os.path.join(output_dir, os.path.relpath(path, root) + ".out") for path in absolute]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many startup scripts against one VFS image")
+    parser.add_argument("--zip_path", required=True, help="Path to the ZIP archive of the virtual file system")
+    parser.add_argument("--hostname", default="batch", help="Hostname for the shell sessions")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--cache_size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Size limit in bytes of the per-worker cache for decompressed file contents")
+    parser.add_argument("--output_dir", help="Directory for per-script output files (<script>.out, keeping the scripts' relative paths)")
+    parser.add_argument("scripts", nargs="+", help="Startup scripts, directories or glob patterns")
+    args = parser.parse_args()
+
+    results, stats = run_batch(args.zip_path, collect_scripts(args.scripts), args.hostname,
+                               args.workers, args.cache_size)
+
+    out_paths = output_paths([result["script"] for result in results], args.output_dir) if args.output_dir else []
+    for i, result in enumerate(results):
+        status = f"error: {result['error']}" if result["error"] else f"{result['commands']} commands"
+        print(f"{result['script']}: {status}, {result['elapsed'] * 1e3:.2f} ms")
+        if args.output_dir:
+            os.makedirs(os.path.dirname(out_paths[i]), exist_ok=True)
+            with open(out_paths[i], 'w', encoding='utf-8') as out_file:
+                out_file.write(result["output"])
+
+    print(f"Scripts: {stats['scripts']} ({stats['errors']} errors), commands: {stats['commands']}")
+    print(f"Image load: {stats['load_time'] * 1e3:.2f} ms, total: {stats['elapsed']:.3f} s")
+    print(f"Throughput: {stats['scripts_per_sec']:.1f} scripts/sec, {stats['commands_per_sec']:.1f} commands/sec")
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from io import BytesIO
+
+from vfs import VirtualFS
+from shell_core import ShellCore
+
+try:
+    import resource
+except ImportError:  # Windows: пиковый RSS недоступен
+    resource = None
+
+
+def generate_names(count, fan_out=100):
+    """Генерирует пути файлов вида 'dNN/dNN/fileN.txt'."""
+    names = []
+    for i in range(count):
+        top = i % fan_out
+        middle = (i // fan_out) % fan_out
+        names.append(f"d{top}/d{middle}/file{i}.txt")
+    return names
+
+
+def flat_ls(fs, directory):
+    """ls по плоскому словарю: просмотр всех ключей."""
+    path = directory.strip("/")
+    if path:
+        path += "/"
+    contents = set()
+    for item in fs:
+        if item.startswith(path):
+            contents.add(item[len(path):].split("/", 1)[0])
+    return sorted(contents)
+
+
+def flat_cd(fs, directory):
+    """Проверка существования каталога по плоскому словарю."""
+    path = directory.strip("/") + "/"
+    return any(name.startswith(path) for name in fs if name != path)
+
+
+def measure(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_directory_index(sizes, repeat):
+    """Сравнивает ls/cd по плоскому словарю и по дереву каталогов."""
+    print(f"{'entries':>10} {'flat ls':>12} {'tree ls':>12} {'flat cd':>12} {'tree cd':>12}")
+    for size in sizes:
+        names = generate_names(size)
+        flat = dict.fromkeys(names)
+        tree = VirtualFS()
+        for name in names:
+            tree.add_entry(name, None)
+
+        target = "/d1/d2"
+        flat_ls_time = measure(lambda: flat_ls(flat, target), repeat)
+        tree_ls_time = measure(lambda: tree.get_dir(target).entries(), repeat)
+        flat_cd_time = measure(lambda: flat_cd(flat, target), repeat)
+        tree_cd_time = measure(lambda: tree.get_dir(target), repeat)
+        print(f"{size:>10} {flat_ls_time * 1e3:>10.3f}ms {tree_ls_time * 1e3:>10.3f}ms "
+              f"{flat_cd_time * 1e3:>10.3f}ms {tree_cd_time * 1e3:>10.3f}ms")
+
+
+def create_archive(path, size_mb, file_mb=64):
+    """Создает STORED-архив заданного размера из текстовых файлов по file_mb МБ."""
+    line = b"benchmark line with some text\n"
+    chunk = line * (1024 * 1024 // len(line))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+        archive.writestr("data/readme.txt", line * 100)
+        for i in range(max(1, size_mb // file_mb)):
+            with archive.open(f"data/part{i // 16}/file{i}.txt", 'w', force_zip64=True) as member:
+                for _ in range(file_mb):
+                    member.write(chunk)
+
+
+def measure_first_command(zip_path, mode):
+    """Загружает архив указанным способом и выполняет первую команду (uniq по небольшому файлу)."""
+    start = time.perf_counter()
+    if mode == "eager":
+        # Прежний способ: все файлы копируются в BytesIO при запуске
+        with zipfile.ZipFile(zip_path, 'r') as archive:
+            fs = {name: BytesIO(archive.read(name)) for name in archive.namelist()}
+        lines = fs["data/readme.txt"].getvalue().decode().splitlines()
+        len(sorted(set(lines)))
+        load_and_run = time.perf_counter() - start
+    else:
+        core = ShellCore("bench", VirtualFS.from_zip(zip_path))
+        core.run("uniq /data/readme.txt")
+        load_and_run = time.perf_counter() - start
+        core.close()
+
+    peak_rss = None
+    if resource is not None:
+        # ru_maxrss - в КБ на Linux и в байтах на macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return {"mode": mode, "time_to_first_command": load_and_run, "peak_rss": peak_rss}
+
+
+def bench_archive(size_mb, modes):
+    """Сравнивает время до первой команды и пиковый RSS на большом архиве.
+
+    Каждый способ загрузки измеряется в отдельном процессе, чтобы пиковый RSS
+    одного не влиял на другой.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, "bench.zip")
+        create_archive(zip_path, size_mb)
+        print(f"Archive: {os.path.getsize(zip_path) / 2 ** 20:.0f} MiB")
+        print(f"{'mode':>8} {'first command':>14} {'peak RSS':>12}")
+        for mode in modes:
+            result = subprocess.run([sys.executable, __file__, "measure", zip_path, mode],
+                                    capture_output=True, text=True, check=True)
+            stats = json.loads(result.stdout)
+            rss = f"{stats['peak_rss'] / 2 ** 20:.1f} MiB" if stats["peak_rss"] else "n/a"
+            print(f"{mode:>8} {stats['time_to_first_command'] * 1e3:>12.1f}ms {rss:>12}")
+
+
+def bench_startup(sizes):
+    """Сравнивает открытие архива без индекса, с построением индекса и с готовым индексом."""
+    print(f"{'entries':>10} {'no index':>12} {'build index':>12} {'warm index':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "bench.zip")
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as archive:
+                for name in generate_names(size):
+                    archive.writestr(name, b"")
+
+            timings = []
+            for use_index in (False, True, True):
+                start = time.perf_counter()
+                VirtualFS.from_zip(zip_path, use_index=use_index).close()
+                timings.append(time.perf_counter() - start)
+            print(f"{size:>10} " + " ".join(f"{timing * 1e3:>10.1f}ms" for timing in timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shell Emulator benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    index_parser = subparsers.add_parser("index", help="Directory tree vs flat scan for ls/cd")
+    index_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                              help="Number of entries in the synthetic file system")
+    index_parser.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement")
+
+    archive_parser = subparsers.add_parser("archive", help="Time to first command and peak RSS on a large archive")
+    archive_parser.add_argument("--size_mb", type=int, default=2048, help="Size of the generated STORED archive")
+    archive_parser.add_argument("--modes", nargs="+", choices=["eager", "mmap"], default=["eager", "mmap"],
+                                help="Loading strategies to compare")
+
+    startup_parser = subparsers.add_parser("startup", help="Cold start vs start from the index sidecar")
+    startup_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                                help="Number of entries in the generated archive")
+
+    measure_parser = subparsers.add_parser("measure", help=argparse.SUPPRESS)
+    measure_parser.add_argument("zip_path")
+    measure_parser.add_argument("mode")
+
+    args = parser.parse_args()
+
+    if args.benchmark == "index":
+        bench_directory_index(args.sizes, args.repeat)
+    elif args.benchmark == "archive":
+        bench_archive(args.size_mb, args.modes)
+    elif args.benchmark == "startup":
+        bench_startup(args.sizes)
+    else:
+        print(json.dumps(measure_first_command(args.zip_path, args.mode)))
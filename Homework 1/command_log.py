@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import threading
+
+
+FSYNC_POLICIES = ("never", "flush", "always")  # Когда вызывать os.fsync для файла журнала
+DEFAULT_FLUSH_INTERVAL = 1.0  # Период фоновой записи буфера в секундах
+
+
+class CommandLogWriter:
+    """Журнал команд в формате JSON Lines с буферизацией.
+
+    Записи копятся в памяти и дописываются в конец файла фоновым потоком
+    раз в flush_interval секунд, поэтому стоимость команды не зависит от
+    длины сессии. При flush_interval <= 0 каждая запись пишется сразу.
+    fsync: 'never' - не вызывать, 'flush' - после каждой записи буфера,
+    'always' - после каждой команды.
+    """
+
+    def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL, fsync="never"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        # Журнал содержит только текущую сессию, дальше файл только дописывается
+        open(path, 'w').close()
+        self.file = open(path, 'a', encoding='utf-8')
+
+        self.thread = None
+        if flush_interval > 0:
+            self.thread = threading.Thread(target=self._flush_periodically, daemon=True)
+            self.thread.start()
+
+    def write(self, entry):
+        """Добавляет запись в буфер журнала."""
+        line = json.dumps(entry, ensure_ascii=False)
+        with self.lock:
+            self.buffer.append(line)
+        if self.thread is None or self.fsync == "always":
+            self.flush()
+
+    def flush(self):
+        """Дописывает накопленные записи в файл."""
+        with self.lock:
+            if not self.buffer or self.file is None:
+                return
+            lines, self.buffer = self.buffer, []
+            self.file.write("\n".join(lines) + "\n")
+            self.file.flush()
+            if self.fsync != "never":
+                os.fsync(self.file.fileno())
+
+    def close(self):
+        """Останавливает фоновый поток, записывает остаток буфера и закрывает файл."""
+        if self.file is None:
+            return
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+        with self.lock:
+            self.file.close()
+            self.file = None
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+
+def read_log(path):
+    """Читает записи журнала JSON Lines."""
+    with open(path, 'r', encoding='utf-8') as log_file:
+        return [json.loads(line) for line in log_file if line.strip()]
+
+
+def convert_to_json(jsonl_path, json_path):
+    """Преобразует журнал JSON Lines в прежний формат: JSON-массив записей."""
+    entries = read_log(jsonl_path)
+    with open(json_path, 'w', encoding='utf-8') as json_file:
+        json.dump(entries, json_file, indent=2)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a JSON Lines command log to a JSON array")
+    parser.add_argument("log_path", help="Path to the JSON Lines log written by the emulator")
+    parser.add_argument("output_path", help="Path to the JSON file to create")
+    args = parser.parse_args()
+
+    count = convert_to_json(args.log_path, args.output_path)
+    print(f"Converted {count} entries to {args.output_path}")
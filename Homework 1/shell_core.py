@@ -0,0 +1,224 @@
+import calendar
+import hashlib
+import io
+from datetime import datetime
+
+from vfs import resolve_path
+
+
+UNIQ_BATCH_LINES = 1000  # Сколько строк uniq выводит за одно обновление вывода
+GLOBAL_UNIQ_LIMIT = 1_000_000  # Максимум запоминаемых хэшей строк в режиме uniq -g
+
+
+def format_uniq_line(line, occurrences, count):
+    """Форматирует строку вывода uniq (с -c - как в POSIX: '%7d %s')."""
+    return f"{occurrences:7d} {line}" if count else line
+
+
+def uniq_adjacent(lines, count=False, repeated=False):
+    """Схлопывает соседние одинаковые строки, сохраняя порядок (POSIX uniq).
+
+    Хранит только предыдущую строку, поэтому память не зависит от размера файла.
+    """
+    previous = None
+    occurrences = 0
+    for line in lines:
+        if line == previous:
+            occurrences += 1
+            continue
+        if previous is not None and (not repeated or occurrences > 1):
+            yield format_uniq_line(previous, occurrences, count)
+        previous, occurrences = line, 1
+    if previous is not None and (not repeated or occurrences > 1):
+        yield format_uniq_line(previous, occurrences, count)
+
+
+def uniq_global(lines, repeated=False, limit=GLOBAL_UNIQ_LIMIT):
+    """Удаляет повторы во всем файле, запоминая хэши строк, а не сами строки.
+
+    Ключ - 128-битный BLAKE2b строки: он не зависит от процесса (в отличие
+    от hash(), который солится при каждом запуске), а вероятность того, что
+    две разные строки из n совпадут по ключу и одна из них пропадет, не
+    больше n^2 / 2^129 - около 10^-27 для миллиона строк.
+
+    Таблица хэшей ограничена limit записями: после переполнения новые строки
+    выводятся без запоминания, и в конце выводится предупреждение.
+    """
+    seen = {}  # Хэш строки -> число вхождений (не больше 2)
+    overflow = False
+    for line in lines:
+        key = hashlib.blake2b(line.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        occurrences = seen.get(key)
+        if occurrences is None:
+            if len(seen) < limit:
+                seen[key] = 1
+            else:
+                overflow = True
+            if not repeated:
+                yield line
+        elif repeated and occurrences == 1:
+            seen[key] = 2
+            yield line
+    if overflow:
+        yield f"uniq: memory budget of {limit} lines exceeded, some duplicates were not removed"
+
+
+class ShellCore:
+    """Командный движок эмулятора без зависимости от GUI.
+
+    Команды - генераторы фрагментов текста: фронтенд (окно Tk или stdout)
+    сам решает, как выводить результат.
+    """
+
+    def __init__(self, hostname, fs, command_log=None):
+        self.hostname = hostname  # Имя хоста для отображения в оболочке
+        self.fs = fs  # Виртуальная файловая система
+        self.command_log = command_log  # Журнал команд (может отсутствовать)
+        self.current_dir = "/"  # Начальная директория - корень
+        self.exited = False  # Выполнена ли команда exit
+        self.command_count = 0  # Число выполненных команд
+
+    def log_command(self, command):
+        """Логирует команды с временными метками в журнал JSON Lines."""
+        if self.command_log is not None:
+            timestamp = datetime.now().isoformat()
+            self.command_log.write({"timestamp": timestamp, "command": command})
+
+    def close(self):
+        """Сбрасывает журнал на диск и закрывает архив."""
+        if self.command_log is not None:
+            self.command_log.close()
+        self.fs.close()
+
+    def execute(self, command):
+        """Определяет и выполняет команду, возвращая поток фрагментов вывода."""
+        parts = command.split()  # Разбиваем команду на части
+        if not parts:
+            return iter(())
+        self.command_count += 1
+        if parts[0] == "ls":
+            return self.ls_command(parts[1] if len(parts) > 1 else "")
+        elif parts[0] == "cd":
+            return self.cd_command(parts[1] if len(parts) > 1 else "")
+        elif parts[0] == "du":
+            return self.du_command(parts[1:])
+        elif parts[0] == "uniq":
+            return self.uniq_command(parts[1:])
+        elif parts[0] == "cal":
+            return self.cal_command()
+        elif parts[0] == "pwd":
+            return self.pwd_command()
+        elif parts[0] == "exit":
+            self.exited = True
+            return iter(())
+        else:
+            return iter([f"Unknown command: {command}"])
+
+    def run(self, command):
+        """Выполняет команду и возвращает весь ее вывод одной строкой."""
+        return "\n".join(self.execute(command))
+
+    def run_script(self, lines):
+        """Логирует и выполняет команды скрипта до конца или до exit."""
+        for line in lines:
+            command = line.strip()
+            if command:
+                self.log_command(command)
+                yield from self.execute(command)
+                if self.exited:
+                    return
+
+    def pwd_command(self):
+        """Отображает текущую директорию."""
+        yield f"Current directory: {self.current_dir}"
+
+    def ls_command(self, directory=""):
+        """Выводит содержимое текущей или указанной директории."""
+        path = resolve_path(self.current_dir, directory)
+        node = self.fs.get_dir(path)
+        if node is None:
+            yield f"No such directory: {directory}"
+            return
+
+        contents = node.entries()
+        if contents:
+            yield "\n".join(contents)
+        else:
+            yield f"No files or directories in '{path}'."
+
+    def cd_command(self, directory):
+        """Меняет текущую директорию (пути вида '..', '/a', 'a/b/../c')."""
+        path = resolve_path(self.current_dir, directory)
+        if self.fs.get_dir(path) is not None:
+            self.current_dir = path
+            yield f"Changed directory to {self.current_dir}"
+        else:
+            yield f"No such directory: {directory}"
+
+    def du_command(self, args):
+        """Выводит размеры подкаталогов и общий размер поддерева (du [-s] [путь])."""
+        summarize = "-s" in args
+        paths = [arg for arg in args if arg != "-s"]
+        target = paths[0] if paths else ""
+
+        # Размеры поддеревьев посчитаны при загрузке, обход файлов не нужен
+        node = self.fs.get_dir(resolve_path(self.current_dir, target))
+        if node is None:
+            yield f"No such directory: {target}"
+            return
+
+        if node.total_size == 0:
+            yield f"No files in directory '{node.path}'."
+            return
+
+        lines = []
+        if not summarize:
+            for name in sorted(node.dirs):
+                child = node.dirs[name]
+                lines.append(f"{child.total_size}\t{child.path}")
+        lines.append(f"Total size of '{node.path}': {node.total_size} bytes")
+        yield "\n".join(lines)
+
+    def uniq_command(self, args):
+        """Выводит файл без соседних повторов строк (uniq [-c] [-d] [-g] файл).
+
+        -c - выводить число повторов, -d - только повторяющиеся строки,
+        -g - удалять повторы во всем файле, а не только соседние.
+        """
+        options = {arg for arg in args if arg.startswith("-")}
+        files = [arg for arg in args if not arg.startswith("-")]
+        unknown = options - {"-c", "-d", "-g"}
+        if unknown:
+            yield f"uniq: unknown option {sorted(unknown)[0]}"
+            return
+        if "-c" in options and "-g" in options:
+            yield "uniq: -c cannot be combined with -g"
+            return
+        file = files[0] if files else ""
+
+        entry = self.fs.get_file(resolve_path(self.current_dir, file))
+        if entry is None:
+            yield f"No such file: {file}"
+            return
+
+        # Файл читается из архива потоком, без загрузки целиком в память
+        with io.TextIOWrapper(self.fs.open(entry), encoding="utf-8", errors="replace") as stream:
+            lines = (line.rstrip("\n") for line in stream)
+            if "-g" in options:
+                result = uniq_global(lines, repeated="-d" in options)
+            else:
+                result = uniq_adjacent(lines, count="-c" in options, repeated="-d" in options)
+
+            batch = []
+            for line in result:
+                batch.append(line)
+                if len(batch) >= UNIQ_BATCH_LINES:
+                    yield "\n".join(batch)
+                    batch = []
+            if batch:
+                yield "\n".join(batch)
+
+    def cal_command(self):
+        """Выводит календарь текущего месяца."""
+        month_calendar = calendar.month(datetime.now().year, datetime.now().month)
+        yield month_calendar
@@ -1,7 +1,21 @@
 import unittest
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import zipfile
+import zlib
 from datetime import datetime
 import calendar
+from unittest import mock
 from main import ShellEmulator
+from shell_core import ShellCore, uniq_global
+import batch_runner
+from batch_runner import output_paths, run_batch
+from vfs import DeflateReader, VirtualFS, FileEntry, LRUCache, resolve_path
+from vfs_index import index_path
+from command_log import CommandLogWriter, convert_to_json, read_log
 import tkinter as tk
 
 
@@ -20,6 +34,7 @@ class TestShellEmulator(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         # Закрытие GUI после завершения тестов
+        cls.emulator.close()
         cls.root.destroy()
 
     def setUp(self):
@@ -66,8 +81,15 @@ class TestShellEmulator(unittest.TestCase):
     def test_du_command(self):
         self.emulator.parse_command("du")
         output = self.emulator.output_area.get("1.0", tk.END).strip()
-        total_size = 50  # укажите общий размер всех файлов в виртуальной ФС
-        self.assertIn(str(total_size), output)
+        total_size = 104  # общий размер всех файлов в виртуальной ФС
+        self.assertIn(f"Total size of '/': {total_size} bytes", output)
+        self.assertIn("36\t/dir1", output)
+        self.assertIn("18\t/dir2", output)
+
+    def test_du_command_summarize(self):
+        self.emulator.parse_command("du -s dir1")
+        output = self.emulator.output_area.get("1.0", tk.END).strip()
+        self.assertEqual(output, "Total size of '/dir1': 36 bytes")
 
     def test_uniq_command_file_with_duplicates(self):
         self.emulator.parse_command("uniq dir1/file1.txt")
@@ -77,7 +99,29 @@ class TestShellEmulator(unittest.TestCase):
     def test_uniq_command_file_no_duplicates(self):
         self.emulator.parse_command("uniq dir1/file2.txt")
         output = self.emulator.output_area.get("1.0", tk.END).strip()
-        self.assertIn("Content\nFile\nTest", output)
+        self.assertIn("Test\nFile\nContent", output)
+
+    def test_uniq_command_keeps_order(self):
+        # uniq схлопывает только соседние повторы: последний 'apple' остается
+        self.emulator.parse_command("uniq nedir.txt")
+        output = self.emulator.output_area.get("1.0", tk.END).strip()
+        self.assertEqual(output, "apple\nbanana\norange\napple")
+
+    def test_uniq_command_count(self):
+        self.emulator.parse_command("uniq -c nedir.txt")
+        # rstrip, а не strip: ведущие пробелы - часть выравнивания счетчика %7d
+        output = self.emulator.output_area.get("1.0", tk.END).rstrip()
+        self.assertIn("      3 apple\n      1 banana\n      2 orange\n      1 apple", output)
+
+    def test_uniq_command_repeated(self):
+        self.emulator.parse_command("uniq -d nedir.txt")
+        output = self.emulator.output_area.get("1.0", tk.END).strip()
+        self.assertEqual(output, "apple\norange")
+
+    def test_uniq_command_global(self):
+        self.emulator.parse_command("uniq -g nedir.txt")
+        output = self.emulator.output_area.get("1.0", tk.END).strip()
+        self.assertEqual(output, "apple\nbanana\norange")
 
     def test_uniq_command_nonexistent_file(self):
         self.emulator.parse_command("uniq nonexistent.txt")
@@ -90,5 +134,291 @@ class TestShellEmulator(unittest.TestCase):
         current_month_calendar = calendar.month(datetime.now().year, datetime.now().month).strip()
         self.assertIn(current_month_calendar, output)
 
+
+
+class TestShellCore(unittest.TestCase):
+    """Проверки движка команд без GUI: не требуют дисплея."""
+
+    def setUp(self):
+        self.core = ShellCore("TestHost", VirtualFS.from_zip("test.zip"))
+
+    def tearDown(self):
+        self.core.close()
+
+    def test_ls_and_cd(self):
+        self.assertEqual(self.core.run("ls"), "dir1\ndir2\nnedir.txt")
+        self.assertEqual(self.core.run("cd dir1"), "Changed directory to /dir1")
+        self.assertEqual(self.core.run("ls"), "file1.txt\nfile2.txt")
+        self.assertEqual(self.core.run("pwd"), "Current directory: /dir1")
+
+    def test_cd_multi_segment_paths(self):
+        self.assertEqual(self.core.run("cd dir1/../dir2"), "Changed directory to /dir2")
+        self.assertEqual(self.core.run("ls ../dir1"), "file1.txt\nfile2.txt")
+        self.assertEqual(self.core.run("uniq -d ../nedir.txt"), "apple\norange")
+        self.assertEqual(self.core.run("cd /dir1/file1.txt"), "No such directory: /dir1/file1.txt")
+        self.assertEqual(self.core.current_dir, "/dir2")
+
+    def test_unknown_command(self):
+        self.assertEqual(self.core.run("rm -rf"), "Unknown command: rm -rf")
+
+    def test_run_script_stops_at_exit(self):
+        output = list(self.core.run_script(["cd dir2", "", "ls", "exit", "pwd"]))
+        self.assertEqual(output, ["Changed directory to /dir2", "file3.txt"])
+        self.assertTrue(self.core.exited)
+
+
+class TestBatchRunner(unittest.TestCase):
+    def run_scripts(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scripts = []
+            for i, directory in enumerate(["dir1", "dir2", "missing"]):
+                path = os.path.join(temp_dir, f"script{i}.sh")
+                with open(path, 'w') as script:
+                    script.write(f"cd {directory}\nls\n")
+                scripts.append(path)
+
+            return run_batch("test.zip", scripts, workers=2)
+
+    def test_run_batch(self):
+        results, stats = self.run_scripts()
+
+        # У каждого скрипта своя текущая директория
+        self.assertEqual(results[0]["output"], "Changed directory to /dir1\nfile1.txt\nfile2.txt")
+        self.assertEqual(results[1]["output"], "Changed directory to /dir2\nfile3.txt")
+        self.assertIn("No such directory: missing", results[2]["output"])
+        self.assertEqual(stats["scripts"], 3)
+        self.assertEqual(stats["commands"], 6)
+        self.assertEqual(stats["errors"], 0)
+
+    def test_output_paths_keep_directories(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scripts = []
+            for directory in ["dir1", "dir2"]:
+                os.makedirs(os.path.join(temp_dir, directory))
+                path = os.path.join(temp_dir, directory, "script.txt")
+                with open(path, 'w') as script:
+                    script.write(f"cd {directory}\nls\n")
+                scripts.append(path)
+            out_dir = os.path.join(temp_dir, "out")
+            result = subprocess.run([sys.executable, "batch_runner.py", "--zip_path", "test.zip",
+                                     "--workers", "1", "--output_dir", out_dir, *scripts],
+                                    capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            # Одноименные скрипты из разных каталогов пишут вывод в разные файлы
+            self.assertEqual(output_paths(scripts, out_dir), [os.path.join(out_dir, "dir1", "script.txt.out"),
+                                                              os.path.join(out_dir, "dir2", "script.txt.out")])
+            with open(os.path.join(out_dir, "dir1", "script.txt.out")) as out_file:
+                self.assertEqual(out_file.read(), "Changed directory to /dir1\nfile1.txt\nfile2.txt")
+            with open(os.path.join(out_dir, "dir2", "script.txt.out")) as out_file:
+                self.assertEqual(out_file.read(), "Changed directory to /dir2\nfile3.txt")
+
+    def test_run_batch_without_fork(self):
+        # На macOS fork не используется: рабочие загружают образ сами
+        with mock.patch.object(batch_runner.sys, "platform", "darwin"):
+            self.assertFalse(batch_runner._can_fork())
+        with mock.patch.object(batch_runner, "_can_fork", return_value=False):
+            results, stats = self.run_scripts()
+        self.assertEqual(results[1]["output"], "Changed directory to /dir2\nfile3.txt")
+        self.assertEqual(stats["commands"], 6)
+
+
+class TestVirtualFS(unittest.TestCase):
+    def setUp(self):
+        self.fs = VirtualFS()
+        self.fs.add_entry("a/", None)
+        self.c_entry = FileEntry("a/b/c.txt", 1)
+        self.fs.add_entry("a/b/c.txt", self.c_entry)
+        self.fs.add_entry("top.txt", FileEntry("top.txt", 3))
+
+    def test_implicit_directories(self):
+        # Каталог 'a/b' создается по пути файла, хотя его нет в архиве
+        self.assertEqual(self.fs.root.entries(), ["a", "top.txt"])
+        self.assertEqual(self.fs.get_dir("/a").entries(), ["b"])
+        self.assertEqual(self.fs.get_dir("/a/b").path, "/a/b")
+
+    def test_resolve_path(self):
+        self.assertEqual(resolve_path("/a", "b/../c"), "/a/c")
+        self.assertEqual(resolve_path("/a/b", "/x/./y/"), "/x/y")
+        self.assertEqual(resolve_path("/", "../.."), "/")
+        self.assertEqual(resolve_path("/a", "b\\c"), "/a/b/c")
+        self.assertEqual(resolve_path("/a", ""), "/a")
+
+    def test_dir_cache(self):
+        node = self.fs.get_dir("/a/b/../b")
+        self.assertIs(self.fs.dir_cache.get("/a/b"), node)
+        self.assertIsNone(self.fs.get_dir("/a/missing"))
+        self.assertNotIn("/a/missing", self.fs.dir_cache.items)
+
+    def test_get_file(self):
+        self.assertIs(self.fs.get_file("/a/b/c.txt"), self.c_entry)
+        self.assertIsNone(self.fs.get_file("/a/missing.txt"))
+        self.assertIsNone(self.fs.get_dir("/a/b/c.txt"))
+
+    def test_subtree_sizes(self):
+        self.assertEqual(self.fs.root.total_size, 4)
+        self.assertEqual(self.fs.get_dir("/a").total_size, 1)
+        # Повторное добавление файла заменяет его размер, а не суммирует
+        self.fs.add_file("a/b/c.txt", FileEntry("a/b/c.txt", 5))
+        self.assertEqual(self.fs.root.total_size, 8)
+
+    def test_lazy_zip_loading(self):
+        fs = VirtualFS.from_zip("test.zip", cache_size=20)
+        try:
+            entry = fs.get_file("/dir1/file1.txt")
+            self.assertEqual(entry.size, 18)
+            self.assertEqual(fs.cache.size, 0)  # Содержимое еще не распаковано
+            self.assertEqual(fs.read(entry), b"Hello\nHello\nWorld\n")
+            self.assertIn(entry.name, fs.cache.items)
+        finally:
+            fs.close()
+
+    def test_uniq_global_memory_budget(self):
+        result = list(uniq_global(["a", "b", "a", "c", "c"], limit=2))
+        self.assertEqual(result[:4], ["a", "b", "c", "c"])
+        self.assertIn("memory budget", result[4])
+        # Ключ - дайджест строки, а не hash(): суррогаты тоже допустимы
+        self.assertEqual(list(uniq_global(["x", "\udcff", "x", "\udcff", "y"], repeated=True)), ["x", "\udcff"])
+
+    def test_deflate_reader_checks_end_of_stream(self):
+        data = b"Hello\n" * 100
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        body = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        compressed = body + compressor.flush()  # Последний блок без данных
+        crc = zlib.crc32(data)
+
+        def read(view, expected_crc=crc, size=len(data)):
+            reader = DeflateReader(memoryview(view), expected_crc, "a.txt", size)
+            reader.CHUNK_SIZE = len(body)  # Конец потока приходит отдельной пустой порцией
+            buffer = bytearray(len(data) * 2)
+            result = b""
+            while True:
+                count = reader.readinto(buffer)
+                if not count:
+                    return result
+                result += buffer[:count]
+
+        self.assertEqual(read(compressed), data)
+        with self.assertRaisesRegex(zipfile.BadZipFile, "CRC-32"):
+            read(compressed, expected_crc=crc ^ 1)
+        with self.assertRaisesRegex(zipfile.BadZipFile, "size"):
+            read(compressed, size=len(data) + 1)
+        with self.assertRaisesRegex(zipfile.BadZipFile, "Truncated"):
+            read(body)
+
+    def test_stored_members_read_from_mmap(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "stored.zip")
+            with zipfile.ZipFile(zip_path, 'w') as archive:
+                archive.writestr("a/stored.txt", "x\nx\ny\n", compress_type=zipfile.ZIP_STORED)
+                archive.writestr("a/packed.txt", "z\nz\n", compress_type=zipfile.ZIP_DEFLATED)
+
+            fs = VirtualFS.from_zip(zip_path)
+            stored = fs.get_file("/a/stored.txt")
+            packed = fs.get_file("/a/packed.txt")
+            view = fs.read(stored)
+            self.assertIsInstance(view, memoryview)  # Без копирования в BytesIO
+            self.assertEqual(bytes(view), b"x\nx\ny\n")
+            self.assertEqual(fs.read(packed), b"z\nz\n")
+
+            core = ShellCore("TestHost", fs)
+            self.assertEqual(core.run("uniq -c a/stored.txt"), "      2 x\n      1 y")
+            self.assertEqual(core.run("uniq a/packed.txt"), "z")
+            del view
+            core.close()
+
+    def test_lru_cache_eviction(self):
+        cache = LRUCache(max_size=4)
+        cache.put("a", b"aa")
+        cache.put("b", b"bb")
+        cache.get("a")
+        cache.put("c", b"cc")
+        self.assertEqual(list(cache.items), ["a", "c"])
+        self.assertEqual(cache.size, 4)
+
+
+class TestVirtualFSIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.zip_path = os.path.join(self.temp_dir.name, "image.zip")
+        self.write_archive({"a/b/one.txt": "1\n1\n2\n", "top.txt": "top"})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_archive(self, files):
+        with zipfile.ZipFile(self.zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, content in files.items():
+                archive.writestr(name, content)
+
+    def test_warm_start_uses_index(self):
+        VirtualFS.from_zip(self.zip_path).close()
+        self.assertTrue(os.path.exists(index_path(self.zip_path)))
+
+        fs = VirtualFS.from_zip(self.zip_path)
+        self.assertIsNone(fs.archive)  # Архив не разбирался через zipfile
+        self.assertEqual(fs.root.entries(), ["a", "top.txt"])
+        self.assertEqual(fs.get_dir("/a").total_size, 6)
+        core = ShellCore("TestHost", fs)
+        self.assertEqual(core.run("uniq -c a/b/one.txt"), "      2 1\n      1 2")
+        core.close()
+
+    def test_stale_index_is_rebuilt(self):
+        VirtualFS.from_zip(self.zip_path).close()
+        self.write_archive({"other.txt": "changed"})
+
+        fs = VirtualFS.from_zip(self.zip_path)
+        self.assertEqual(fs.root.entries(), ["other.txt"])
+        fs.close()
+
+    def test_corrupt_index_is_rebuilt(self):
+        with open(index_path(self.zip_path), 'wb') as index_file:
+            index_file.write(b"garbage")
+
+        fs = VirtualFS.from_zip(self.zip_path)
+        self.assertEqual(fs.root.entries(), ["a", "top.txt"])
+        fs.close()
+
+        # Перестроенный индекс снова пригоден для быстрого старта
+        fs = VirtualFS.from_zip(self.zip_path)
+        self.assertIsNone(fs.archive)
+        fs.close()
+
+
+class TestCommandLog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.temp_dir.name, "log.jsonl")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_buffered_until_close(self):
+        writer = CommandLogWriter(self.log_path, flush_interval=60)
+        writer.write({"command": "ls"})
+        writer.write({"command": "pwd"})
+        self.assertEqual(read_log(self.log_path), [])  # Записи еще в буфере
+        writer.close()
+        self.assertEqual(read_log(self.log_path), [{"command": "ls"}, {"command": "pwd"}])
+
+    def test_write_through_and_fsync(self):
+        writer = CommandLogWriter(self.log_path, flush_interval=0, fsync="flush")
+        writer.write({"command": "cal"})
+        self.assertEqual(read_log(self.log_path), [{"command": "cal"}])
+        writer.close()
+
+    def test_convert_to_json(self):
+        writer = CommandLogWriter(self.log_path, flush_interval=0)
+        writer.write({"timestamp": "t", "command": "ls"})
+        writer.close()
+        json_path = os.path.join(self.temp_dir.name, "log.json")
+        self.assertEqual(convert_to_json(self.log_path, json_path), 1)
+        with open(json_path) as json_file:
+            self.assertEqual(json.load(json_file), [{"timestamp": "t", "command": "ls"}])
+
+    def test_unknown_fsync_policy(self):
+        with self.assertRaises(ValueError):
+            CommandLogWriter(self.log_path, fsync="sometimes")
+
+
 if __name__ == "__main__":
     unittest.main()
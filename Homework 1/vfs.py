@@ -0,0 +1,392 @@
+import io
+import mmap
+import posixpath
+import struct
+import zipfile
+import zlib
+from collections import OrderedDict
+
+from vfs_index import archive_key, read_index, write_index
+
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024  # Объем кэша содержимого файлов в байтах
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")  # Локальный заголовок файла ZIP (30 байт)
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+DIR_CACHE_SIZE = 4096  # Сколько разрешенных путей каталогов хранить в кэше
+
+
+def resolve_path(current_dir, target):
+    """Приводит путь target относительно current_dir к абсолютному виду '/a/b'.
+
+    Поддерживает абсолютные и относительные пути, '.', '..' (выше корня
+    подняться нельзя) и обратные слэши.
+    """
+    path = posixpath.normpath(posixpath.join(current_dir, target.replace("\\", "/")))
+    return "/" + path.lstrip("/")
+
+
+class FileEntry:
+    """Метаданные файла архива; содержимое читается только по запросу."""
+
+    __slots__ = ("name", "size", "compress_size", "compress_type", "flag_bits", "crc", "header_offset", "offset")
+
+    def __init__(self, name, size, compress_size=None, compress_type=zipfile.ZIP_STORED, flag_bits=0, crc=0,
+                 header_offset=None):
+        self.name = name
+        self.size = size  # Размер без сжатия из центрального каталога ZIP
+        self.compress_size = size if compress_size is None else compress_size
+        self.compress_type = compress_type
+        self.flag_bits = flag_bits
+        self.crc = crc
+        self.header_offset = header_offset  # Смещение локального заголовка в архиве
+        self.offset = None  # Смещение данных в архиве, вычисляется при первом чтении
+
+    @classmethod
+    def from_info(cls, info):
+        return cls(info.filename, info.file_size, info.compress_size, info.compress_type, info.flag_bits,
+                   info.CRC, info.header_offset)
+
+    @property
+    def encrypted(self):
+        return bool(self.flag_bits & 0x1)
+
+    @property
+    def stored(self):
+        """Хранится ли файл без сжатия и шифрования (можно читать прямо из mmap)."""
+        return self.compress_type == zipfile.ZIP_STORED and not self.encrypted
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Поток для чтения memoryview без копирования всего буфера."""
+
+    def __init__(self, view):
+        super().__init__()
+        self.view = view
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self.view[self.position:self.position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+    def close(self):
+        self.view = None
+        super().close()
+
+
+class DeflateReader(io.RawIOBase):
+    """Поток, распаковывающий DEFLATE-данные прямо из memoryview архива.
+
+    Распаковка идет порциями не больше запрошенного буфера, контрольная
+    сумма CRC-32 и размер проверяются по достижении конца потока.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, view, crc, name, size=None):
+        super().__init__()
+        self.view = view
+        self.position = 0
+        self.expected_crc = crc
+        self.expected_size = size
+        self.crc = 0
+        self.size = 0
+        self.name = name
+        self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.decompressor.eof:
+            data = self.decompressor.unconsumed_tail
+            if not data and self.position < len(self.view):
+                data = self.view[self.position:self.position + self.CHUNK_SIZE]
+                self.position += len(data)
+            chunk = self.decompressor.decompress(data, len(buffer))
+            if chunk:
+                buffer[:len(chunk)] = chunk
+                self.crc = zlib.crc32(chunk, self.crc)
+                self.size += len(chunk)
+            # Конец потока может прийти и с пустой последней порцией
+            if self.decompressor.eof:
+                self.check()
+            if chunk:
+                return len(chunk)
+            if not data:
+                raise zipfile.BadZipFile(f"Truncated compressed data for file {self.name!r}")
+        return 0
+
+    def check(self):
+        if self.crc != self.expected_crc:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for file {self.name!r}")
+        if self.expected_size is not None and self.size != self.expected_size:
+            raise zipfile.BadZipFile(f"Bad size for file {self.name!r}")
+
+    def close(self):
+        self.view = None
+        super().close()
+
+
+class LRUCache:
+    """LRU-кэш, ограниченный суммарным размером значений (по умолчанию - len)."""
+
+    def __init__(self, max_size, sizeof=len):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.items = OrderedDict()
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is not None:
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        value_size = self.sizeof(value)
+        if value_size > self.max_size:
+            return  # Слишком большое значение не вытесняет весь кэш
+        old = self.items.pop(key, None)
+        if old is not None:
+            self.size -= self.sizeof(old)
+        self.items[key] = value
+        self.size += value_size
+        while self.size > self.max_size:
+            _, evicted = self.items.popitem(last=False)
+            self.size -= self.sizeof(evicted)
+
+    def clear(self):
+        self.items.clear()
+        self.size = 0
+
+
+class DirNode:
+    """Узел каталога виртуальной файловой системы."""
+
+    __slots__ = ("name", "parent", "dirs", "files", "total_size")
+
+    def __init__(self, name="", parent=None):
+        self.name = name
+        self.parent = parent
+        self.dirs = {}  # Имя подкаталога -> DirNode
+        self.files = {}  # Имя файла -> FileEntry
+        self.total_size = 0  # Суммарный размер файлов во всем поддереве
+
+    @property
+    def path(self):
+        """Абсолютный путь каталога в виде '/a/b'."""
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return "/" + "/".join(reversed(parts))
+
+    def entries(self):
+        """Возвращает отсортированный список имен в каталоге."""
+        return sorted(self.dirs.keys() | self.files.keys())
+
+
+class VirtualFS:
+    """Виртуальная файловая система в виде дерева каталогов.
+
+    Каталоги, которых нет в архиве явно, создаются по путям файлов,
+    поэтому ls/cd работают за O(число элементов каталога). При загрузке
+    из ZIP читается только центральный каталог. Несжатые (STORED) файлы
+    отдаются срезами memoryview отображенного в память архива, без копий;
+    сжатые распаковываются при первом обращении и хранятся в LRU-кэше.
+    """
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE):
+        self.root = DirNode()
+        self.zip_path = None
+        self.archive = None  # ZipFile, открывается только для редких методов сжатия
+        self.mapping = None  # mmap всего архива, общий для процессов после fork
+        self.cache = LRUCache(cache_size)
+        self.dir_cache = LRUCache(DIR_CACHE_SIZE, sizeof=lambda node: 1)  # Путь -> DirNode
+
+    @classmethod
+    def from_zip(cls, zip_path, cache_size=DEFAULT_CACHE_SIZE, use_index=True):
+        """Открывает архив: дерево берется из индекса рядом с архивом или строится заново.
+
+        Индекс (zip_path + '.idx') привязан к размеру, mtime и хэшу центрального
+        каталога архива; устаревший или поврежденный индекс перестраивается.
+        """
+        fs = cls(cache_size)
+        fs.zip_path = zip_path
+        with open(zip_path, 'rb') as zip_file:
+            fs.mapping = mmap.mmap(zip_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        key = archive_key(zip_path, fs.mapping) if use_index else None
+        tables = read_index(zip_path, key) if use_index else None
+        if tables is not None:
+            try:
+                fs.load_tables(tables)
+                return fs
+            except (ValueError, TypeError, IndexError):
+                fs.root = DirNode()  # Поврежденный индекс: строим дерево заново
+
+        fs.archive = zipfile.ZipFile(zip_path, 'r')
+        for info in fs.archive.infolist():
+            entry = None if info.is_dir() else FileEntry.from_info(info)
+            fs.add_entry(info.filename, entry)
+        if use_index:
+            write_index(zip_path, key, fs.dump_tables())
+        return fs
+
+    def dump_tables(self):
+        """Сериализует дерево в плоские таблицы для индекса (каталоги в порядке обхода)."""
+        dir_parents, dir_names, dir_sizes = [], [], []
+        file_columns = tuple([] for _ in range(9))
+        nodes = [(self.root, -1)]
+        while nodes:
+            node, parent = nodes.pop()
+            index = len(dir_names)
+            dir_parents.append(parent)
+            dir_names.append(node.name)
+            dir_sizes.append(node.total_size)
+            for name, entry in node.files.items():
+                row = (index, name, entry.name, entry.size, entry.compress_size, entry.compress_type,
+                       entry.flag_bits, entry.crc, entry.header_offset)
+                for column, value in zip(file_columns, row):
+                    column.append(value)
+            nodes.extend((child, index) for child in node.dirs.values())
+        return dir_parents, dir_names, dir_sizes, file_columns
+
+    def load_tables(self, tables):
+        """Восстанавливает дерево из таблиц индекса без разбора архива."""
+        dir_parents, dir_names, dir_sizes, file_columns = tables
+        nodes = []
+        for parent, name, total_size in zip(dir_parents, dir_names, dir_sizes):
+            if parent < 0:
+                node = self.root
+            else:
+                parent_node = nodes[parent]
+                node = parent_node.dirs[name] = DirNode(name, parent_node)
+            node.total_size = total_size
+            nodes.append(node)
+        for index, name, *fields in zip(*file_columns):
+            nodes[index].files[name] = FileEntry(*fields)
+
+    def reopen(self):
+        """Сбрасывает унаследованный ZipFile, не трогая дерево каталогов и mmap.
+
+        Нужен в дочернем процессе после fork: унаследованный файл имеет общую
+        с родителем позицию чтения, поэтому параллельные чтения мешали бы друг другу.
+        При необходимости процесс откроет собственный ZipFile.
+        """
+        self.archive = None
+
+    def close(self):
+        """Закрывает архив и очищает кэш."""
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+        if self.mapping is not None:
+            try:
+                self.mapping.close()
+            except BufferError:
+                pass  # На отображение еще ссылаются memoryview, его закроет сборщик мусора
+            self.mapping = None
+        self.cache.clear()
+
+    def _split(self, path):
+        return [part for part in path.replace("\\", "/").split("/") if part]
+
+    def make_dir(self, path):
+        """Создает каталог (и все промежуточные) и возвращает его узел."""
+        node = self.root
+        for part in self._split(path):
+            child = node.dirs.get(part)
+            if child is None:
+                child = node.dirs[part] = DirNode(part, node)
+            node = child
+        return node
+
+    def add_file(self, path, entry):
+        """Добавляет файл, создавая недостающие каталоги по пути.
+
+        Размер файла сразу прибавляется к total_size всех предков,
+        поэтому размер любого поддерева доступен за O(1).
+        """
+        parent, name = posixpath.split(path.replace("\\", "/").strip("/"))
+        node = self.make_dir(parent)
+        old = node.files.get(name)
+        node.files[name] = entry
+        delta = (entry.size if entry else 0) - (old.size if old else 0)
+        while node is not None:
+            node.total_size += delta
+            node = node.parent
+
+    def add_entry(self, name, entry):
+        """Добавляет элемент архива: имена с '/' на конце - каталоги."""
+        if name.endswith("/"):
+            self.make_dir(name)
+        else:
+            self.add_file(name, entry)
+
+    def get_dir(self, path):
+        """Возвращает узел каталога по пути (от корня) или None.
+
+        Найденные узлы кэшируются по нормализованному пути; промахи не
+        кэшируются, поэтому созданные позже каталоги не теряются.
+        """
+        path = resolve_path("/", path)
+        node = self.dir_cache.get(path)
+        if node is not None:
+            return node
+        node = self.root
+        for part in self._split(path):
+            node = node.dirs.get(part)
+            if node is None:
+                return None
+        self.dir_cache.put(path, node)
+        return node
+
+    def get_file(self, path):
+        """Возвращает FileEntry по пути (от корня) или None."""
+        parent, name = posixpath.split(resolve_path("/", path))
+        node = self.get_dir(parent)
+        if node is None:
+            return None
+        return node.files.get(name)
+
+    def raw_view(self, entry):
+        """Возвращает memoryview данных файла (как они лежат в архиве) в отображении."""
+        if entry.offset is None:
+            header = LOCAL_HEADER.unpack_from(self.mapping, entry.header_offset)
+            if header[0] != LOCAL_HEADER_SIGNATURE:
+                raise zipfile.BadZipFile(f"Bad local header for {entry.name}")
+            name_length, extra_length = header[9], header[10]
+            entry.offset = entry.header_offset + LOCAL_HEADER.size + name_length + extra_length
+        return memoryview(self.mapping)[entry.offset:entry.offset + entry.compress_size]
+
+    def read(self, entry):
+        """Возвращает содержимое файла: срез mmap для STORED, иначе распакованные байты."""
+        if entry.stored:
+            return self.raw_view(entry)
+        data = self.cache.get(entry.name)
+        if data is None:
+            with self.open(entry) as stream:
+                data = stream.read()
+            self.cache.put(entry.name, data)
+        return data
+
+    def open(self, entry):
+        """Открывает файл как бинарный поток: из mmap или с распаковкой на лету."""
+        if entry.stored:
+            return io.BufferedReader(MemoryViewReader(self.raw_view(entry)))
+        data = self.cache.get(entry.name)
+        if data is not None:
+            return io.BytesIO(data)
+        if entry.compress_type == zipfile.ZIP_DEFLATED and not entry.encrypted:
+            return io.BufferedReader(DeflateReader(self.raw_view(entry), entry.crc, entry.name, entry.size))
+        # Прочие методы сжатия и шифрование - через zipfile
+        if self.archive is None:
+            self.archive = zipfile.ZipFile(self.zip_path, 'r')
+        return self.archive.open(entry.name)
@@ -0,0 +1,82 @@
+import hashlib
+import marshal
+import os
+import struct
+import zipfile
+
+
+INDEX_MAGIC = b"VFSIDX\x00\x01"  # Сигнатура и версия формата индекса
+INDEX_SUFFIX = ".idx"  # Индекс лежит рядом с архивом: test.zip -> test.zip.idx
+
+END_RECORD = struct.Struct("<4s4H2LH")  # Конец центрального каталога (EOCD)
+END_RECORD_SIGNATURE = b"PK\x05\x06"
+ZIP64_LOCATOR = struct.Struct("<4sLQL")
+ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+ZIP64_END_RECORD = struct.Struct("<4sQ2H2L4Q")
+ZIP64_END_RECORD_SIGNATURE = b"PK\x06\x06"
+MAX_COMMENT = 0xFFFF
+
+
+def index_path(zip_path):
+    """Путь к файлу индекса для архива."""
+    return zip_path + INDEX_SUFFIX
+
+
+def central_directory(mapping):
+    """Возвращает (начало, конец) центрального каталога в отображении архива."""
+    search_start = max(0, len(mapping) - END_RECORD.size - MAX_COMMENT)
+    end_offset = mapping.rfind(END_RECORD_SIGNATURE, search_start)
+    if end_offset < 0:
+        raise zipfile.BadZipFile("End of central directory record not found")
+    cd_size = END_RECORD.unpack_from(mapping, end_offset)[5]
+
+    # В ZIP64 настоящий размер каталога лежит в отдельной записи перед EOCD
+    locator_offset = end_offset - ZIP64_LOCATOR.size
+    if locator_offset >= 0 and mapping[locator_offset:locator_offset + 4] == ZIP64_LOCATOR_SIGNATURE:
+        end_offset = locator_offset - ZIP64_END_RECORD.size
+        record = ZIP64_END_RECORD.unpack_from(mapping, end_offset)
+        if record[0] != ZIP64_END_RECORD_SIGNATURE:
+            raise zipfile.BadZipFile("Corrupt ZIP64 end of central directory record")
+        cd_size = record[8]
+
+    if cd_size > end_offset:
+        raise zipfile.BadZipFile("Central directory size is out of range")
+    return end_offset - cd_size, end_offset
+
+
+def archive_key(zip_path, mapping):
+    """Ключ актуальности индекса: размер, mtime и хэш центрального каталога."""
+    stat = os.stat(zip_path)
+    start, end = central_directory(mapping)
+    digest = hashlib.blake2b(memoryview(mapping)[start:end], digest_size=16).digest()
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+def read_index(zip_path, key):
+    """Читает таблицы индекса; None, если индекса нет, он устарел или поврежден."""
+    try:
+        with open(index_path(zip_path), 'rb') as index_file:
+            data = index_file.read()
+        if not data.startswith(INDEX_MAGIC):
+            return None
+        stored_key, tables = marshal.loads(memoryview(data)[len(INDEX_MAGIC):])
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if stored_key != key:
+        return None
+    return tables
+
+
+def write_index(zip_path, key, tables):
+    """Атомарно записывает индекс; ошибки записи (например, нет прав) не фатальны."""
+    path = index_path(zip_path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as index_file:
+            index_file.write(INDEX_MAGIC + marshal.dumps((key, tables)))
+        os.replace(temp_path, path)
+        return True
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
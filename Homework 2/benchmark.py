@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from commit_graph import CommitGraph, iter_plantuml
+from dependency_visualizer import DependencyVisualizer
+from exporters import EXPORTERS, create_exporter
+from graph_reduction import collapse_linear_runs, reduce_history
+
+
+def create_repository(path, commit_count, files=10):
+    """Создает репозиторий с линейной историей через git fast-import.
+
+    Каждый коммит меняет один из files файлов; example.py меняется в каждом
+    files-м коммите. Сообщения из одного слова, чтобы вывод старой реализации
+    можно было сравнить с новой.
+    """
+    subprocess.run(['git', 'init', '-q', str(path)], check=True)
+    lines = []
+    for i in range(commit_count):
+        name = 'example.py' if i % files == 0 else f'file{i % files}.txt'
+        content = f'{i}\n'.encode()
+        message = f'commit{i}'.encode()
+        lines.append(b'commit refs/heads/master\n')
+        lines.append(f'mark :{i + 1}\n'.encode())
+        lines.append(f'committer Bench <bench@example.com> {1_600_000_000 + i} +0000\n'.encode())
+        lines.append(f'data {len(message)}\n'.encode() + message + b'\n')
+        if i:
+            lines.append(f'from :{i}\n'.encode())
+        lines.append(f'M 100644 inline {name}\ndata {len(content)}\n'.encode() + content + b'\n')
+    subprocess.run(['git', '-C', str(path), 'fast-import', '--quiet'], input=b''.join(lines), check=True)
+
+
+def legacy_get_commits_with_file(repository_path, target_file):
+    """Прежняя реализация: git log и отдельный git show для каждого коммита."""
+    command = ['git', '-C', str(repository_path), 'log', '--pretty=format:%H %P %s', '--all']
+    result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8')
+    commits_with_file = []
+    for line in result.stdout.strip().split('\n'):
+        parts = line.split(" ")
+        show_command = ['git', '-C', str(repository_path), 'show', '--name-only', '--pretty=format:', parts[0]]
+        show_result = subprocess.run(show_command, capture_output=True, text=True, check=True, encoding='utf-8')
+        if target_file in show_result.stdout:
+            commits_with_file.append((parts[0], " ".join(parts[1:-1]), parts[-1]))
+    return commits_with_file
+
+
+def make_visualizer(temp_dir, repository_path, target_file='example.py', backend='subprocess', use_cache=False):
+    config_path = os.path.join(temp_dir, 'config.json')
+    with open(config_path, 'w', encoding='utf-8') as config_file:
+        json.dump({
+            'graph_visualizer_path': 'plantuml.jar',
+            'repository_path': str(repository_path),
+            'output_path': os.path.join(temp_dir, 'output.puml'),
+            'target_file': target_file,
+            'use_cache': use_cache,
+            'backend': backend,
+        }, config_file)
+    return DependencyVisualizer(config_path)
+
+
+def bench_history_scan(sizes, legacy_limit):
+    """Сравнивает однопроходное чтение истории с git show на каждый коммит."""
+    print(f"{'commits':>10} {'single pass':>12} {'per commit':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            repository_path = os.path.join(temp_dir, 'repo')
+            create_repository(repository_path, size)
+            visualizer = make_visualizer(temp_dir, repository_path)
+
+            start = time.perf_counter()
+            commits = visualizer.get_commits_with_file()
+            single_pass = time.perf_counter() - start
+
+            legacy = 'skipped'
+            if size <= legacy_limit:
+                start = time.perf_counter()
+                expected = legacy_get_commits_with_file(repository_path, 'example.py')
+                legacy = f"{(time.perf_counter() - start) * 1e3:.0f}ms"
+                if commits != expected:
+                    raise AssertionError(f"Results differ for {size} commits")
+            print(f"{size:>10} {single_pass * 1e3:>10.0f}ms {legacy:>12}")
+
+
+def generate_commits(count, merge_every=100):
+    """Синтетический список коммитов в порядке git log (от новых к старым)."""
+    commits = []
+    for i in range(count):
+        parents = [f'{i - 1:040x}'] if i else []
+        if i > merge_every and i % merge_every == 0:
+            parents.append(f'{i - merge_every // 2:040x}')
+        commits.append((f'{i:040x}', ' '.join(parents), f'commit{i}'))
+    commits.reverse()
+    return commits
+
+
+def legacy_build_graph(commits):
+    """Прежняя реализация: поиск родителей перебором и конкатенация строк."""
+    graph = "@startuml\nskinparam linetype ortho\nskinparam monochrome true\n"
+    commit_map = {commit[0]: commit[2] for commit in commits}
+    for commit_hash in reversed([commit[0] for commit in commits]):
+        graph += f'"{commit_hash}" : "{commit_map[commit_hash]}"\n'
+        parents = next((parents for commit, parents, _ in commits if commit == commit_hash), None)
+        if parents:
+            for parent in parents.split():
+                graph += f'"{parent}" --> "{commit_hash}"\n'
+    return graph + "@enduml\n"
+
+
+def measure_graph(func):
+    """Время выполнения и пиковая дополнительная память (tracemalloc, отдельный прогон)."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_graph(sizes, legacy_limit):
+    """Сравнивает построение и сохранение графа: линейный DAG и поток в файл против прежнего способа."""
+    print(f"{'commits':>10} {'new time':>10} {'new peak':>10} {'old time':>10} {'old peak':>10}")
+    for size in sizes:
+        commits = generate_commits(size)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            visualizer = make_visualizer(temp_dir, temp_dir)
+            visualizer.output_path = Path(temp_dir) / 'new.puml'
+            new_time, new_peak = measure_graph(
+                lambda: visualizer.save_graph(visualizer.build_commit_graph(commits)))
+
+            old = ['skipped', '']
+            if size <= legacy_limit:
+                def legacy():
+                    with open(Path(temp_dir) / 'old.puml', 'w', encoding='utf-8') as file:
+                        file.write(legacy_build_graph(commits))
+                old_time, old_peak = measure_graph(legacy)
+                old = [f'{old_time * 1e3:.0f}ms', f'{old_peak / 2 ** 20:.1f}MiB']
+                if (Path(temp_dir) / 'old.puml').read_text() != visualizer.output_path.read_text():
+                    raise AssertionError(f"Graphs differ for {size} commits")
+        print(f"{size:>10} {new_time * 1e3:>8.0f}ms {new_peak / 2 ** 20:>7.1f}MiB {old[0]:>10} {old[1]:>10}")
+
+
+def bench_reduce(sizes, touch_every):
+    """Размер графа PlantUML и время его подготовки без упрощения, с упрощением и со свертыванием участков."""
+    print(f"{'commits':>10} {'mode':>10} {'nodes':>8} {'edges':>8} {'puml':>10} {'time':>10}")
+    for size in sizes:
+        history = [(commit_hash, parents, message, [], [], 1_600_000_000 + size - i)
+                   for i, (commit_hash, parents, message) in enumerate(generate_commits(size))]
+        positions = list(range(0, size, touch_every))
+        modes = {
+            'full': lambda: [history[position][:3] for position in positions],
+            'reduced': lambda: reduce_history(history, positions),
+            'collapsed': lambda: collapse_linear_runs(reduce_history(history, positions)),
+        }
+        for mode, select in modes.items():
+            start = time.perf_counter()
+            graph = CommitGraph.from_commits(select())
+            puml_size = sum(len(line) for line in iter_plantuml(graph))
+            elapsed = time.perf_counter() - start
+            print(f"{size:>10} {mode:>10} {len(graph.hashes):>8} {len(graph.parent_indices):>8} "
+                  f"{puml_size / 2 ** 10:>8.0f}KB {elapsed * 1e3:>8.0f}ms")
+
+
+def iter_generated_commits(count, merge_every=100):
+    """Как generate_commits, но без списка в памяти: коммиты от новых к старым."""
+    for i in reversed(range(count)):
+        parents = [f'{i - 1:040x}'] if i else []
+        if i > merge_every and i % merge_every == 0:
+            parents.append(f'{i - merge_every // 2:040x}')
+        yield f'{i:040x}', ' '.join(parents), f'commit{i}'
+
+
+def bench_export(sizes):
+    """Время и пиковая память потоковой записи в каждом формате против CommitGraph."""
+    print(f"{'commits':>10} {'format':>10} {'time':>10} {'peak':>10} {'size':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / 'graph'
+
+            def export(name):
+                with open(path, 'wb' if name == 'binary' else 'w', encoding=None if name == 'binary' else 'utf-8') as file:
+                    create_exporter(name, file).write_all(iter_generated_commits(size))
+
+            runs = {name: lambda name=name: export(name) for name in EXPORTERS}
+            visualizer = make_visualizer(temp_dir, temp_dir)
+            runs['graph'] = lambda: visualizer.save_graph(
+                visualizer.build_commit_graph(iter_generated_commits(size)), path)
+            for name, func in runs.items():
+                elapsed, peak = measure_graph(func)
+                print(f"{size:>10} {name:>10} {elapsed * 1e3:>8.0f}ms {peak / 2 ** 20:>7.1f}MiB "
+                      f"{path.stat().st_size / 2 ** 20:>7.1f}MiB")
+
+
+def bench_backends(sizes, repack):
+    """Сравнивает бэкенды: полный просмотр истории и повторный запуск с кэшем.
+
+    При повторном запуске история не менялась, поэтому время уходит на чтение
+    ссылок, проверку предков и поиск новых коммитов - здесь бэкенд без
+    запуска процессов git выигрывает больше всего.
+    """
+    print(f"{'commits':>10} {'full git':>10} {'full native':>12} {'warm git':>10} {'warm native':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            repository_path = os.path.join(temp_dir, 'repo')
+            create_repository(repository_path, size)
+            if repack:
+                # Паки с дельтами, как после git gc
+                subprocess.run(['git', '-C', repository_path, 'repack', '-adfq'], check=True)
+
+            row = []
+            histories = {}
+            for scan in ('full', 'warm'):
+                for backend in ('subprocess', 'native'):
+                    backend_dir = os.path.join(temp_dir, backend)
+                    os.makedirs(backend_dir, exist_ok=True)
+                    visualizer = make_visualizer(backend_dir, repository_path, backend=backend, use_cache=True)
+                    start = time.perf_counter()
+                    histories[backend] = visualizer.load_history()
+                    row.append(time.perf_counter() - start)
+                    visualizer.backend.close()
+                    if visualizer.last_scan != ('full' if scan == 'full' else 'incremental'):
+                        raise AssertionError(f"Unexpected {visualizer.last_scan} scan")
+                if histories['subprocess'] != histories['native']:
+                    raise AssertionError(f"Histories differ for {size} commits")
+        print(f"{size:>10} " + " ".join(f"{timing * 1e3:>{width}.1f}ms"
+                                         for timing, width in zip(row, (8, 10, 8, 10))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dependency visualizer benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    history_parser = subparsers.add_parser('history', help='Single git log pass vs git show per commit')
+    history_parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                                help='Number of commits in the synthetic repositories')
+    history_parser.add_argument('--legacy-limit', type=int, default=10_000,
+                                help='Largest repository on which to run the per-commit git show implementation')
+
+    graph_parser = subparsers.add_parser('graph', help='Building and saving the PlantUML graph')
+    graph_parser.add_argument('--sizes', type=int, nargs='+', default=[5_000, 50_000, 500_000],
+                              help='Number of commits in the synthetic graph')
+    graph_parser.add_argument('--legacy-limit', type=int, default=5_000,
+                              help='Largest graph on which to run the quadratic implementation')
+
+    backends_parser = subparsers.add_parser('backends', help='git subprocess backend vs native object reader')
+    backends_parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                                 help='Number of commits in the synthetic repositories')
+    backends_parser.add_argument('--repack', action='store_true',
+                                 help='Repack the repositories with deltas before measuring')
+
+    reduce_parser = subparsers.add_parser('reduce', help='Graph size with and without history reduction')
+    reduce_parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                               help='Number of commits in the synthetic history')
+    reduce_parser.add_argument('--touch-every', type=int, default=3,
+                               help='Every N-th commit touches the target file')
+
+    export_parser = subparsers.add_parser('export', help='Streaming exporters vs building the whole graph')
+    export_parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000],
+                               help='Number of commits in the synthetic history')
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'history':
+        bench_history_scan(args.sizes, args.legacy_limit)
+    elif args.benchmark == 'graph':
+        bench_graph(args.sizes, args.legacy_limit)
+    elif args.benchmark == 'export':
+        bench_export(args.sizes)
+    elif args.benchmark == 'reduce':
+        bench_reduce(args.sizes, args.touch_every)
+    else:
+        bench_backends(args.sizes, args.repack)
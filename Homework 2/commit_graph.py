@@ -0,0 +1,81 @@
+from array import array
+
+
+PLANTUML_HEADER = "@startuml\nskinparam linetype ortho\nskinparam monochrome true\n"
+PLANTUML_FOOTER = "@enduml\n"
+WRITE_CHUNK_LINES = 4096  # Сколько строк накапливать перед записью в файл
+
+
+class CommitGraph:
+    """DAG коммитов в компактном виде.
+
+    Каждому хэшу (коммиту или внешнему родителю, не попавшему в выборку)
+    соответствует индекс. Родители коммитов хранятся плоским массивом
+    индексов parent_indices, границы - в parent_offsets, поэтому
+    построение и обход графа линейны по числу вершин и ребер.
+    """
+
+    def __init__(self):
+        self.hashes = []  # Индекс вершины -> хэш
+        self.messages = []  # Индекс вершины -> сообщение (None для внешних родителей)
+        self.index = {}  # Хэш -> индекс вершины
+        self.commits = array('q')  # Вершины коммитов в порядке git log (от новых к старым)
+        self.parent_offsets = array('q', [0])  # Родители i-го коммита: parent_indices[offsets[i]:offsets[i + 1]]
+        self.parent_indices = array('q')
+
+    @classmethod
+    def from_commits(cls, commits):
+        """Строит граф из кортежей (хэш, родители через пробел, сообщение)."""
+        graph = cls()
+        for commit_hash, parents, commit_message in commits:
+            graph.add_commit(commit_hash, parents.split(), commit_message)
+        return graph
+
+    def node(self, commit_hash):
+        """Возвращает индекс вершины, добавляя ее при первом упоминании."""
+        index = self.index.get(commit_hash)
+        if index is None:
+            index = self.index[commit_hash] = len(self.hashes)
+            self.hashes.append(commit_hash)
+            self.messages.append(None)
+        return index
+
+    def add_commit(self, commit_hash, parents, commit_message):
+        node = self.node(commit_hash)
+        self.messages[node] = commit_message
+        self.commits.append(node)
+        for parent in parents:
+            self.parent_indices.append(self.node(parent))
+        self.parent_offsets.append(len(self.parent_indices))
+
+    def __len__(self):
+        return len(self.commits)
+
+    def parents(self, position):
+        """Индексы родителей коммита с номером position (в порядке git log)."""
+        return self.parent_indices[self.parent_offsets[position]:self.parent_offsets[position + 1]]
+
+
+def iter_plantuml(graph):
+    """Выдает строки PlantUML по одной: коммиты от старых к новым и ребра от родителей."""
+    yield PLANTUML_HEADER
+    hashes = graph.hashes
+    for position in reversed(range(len(graph))):
+        node = graph.commits[position]
+        commit_hash = hashes[node]
+        yield f'"{commit_hash}" : "{graph.messages[node]}"\n'
+        for parent in graph.parents(position):
+            yield f'"{hashes[parent]}" --> "{commit_hash}"\n'
+    yield PLANTUML_FOOTER
+
+
+def write_chunks(lines, file, chunk_lines=WRITE_CHUNK_LINES):
+    """Пишет строки в файл порциями по chunk_lines, не собирая весь текст в памяти."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_lines:
+            file.write(''.join(chunk))
+            chunk.clear()
+    if chunk:
+        file.write(''.join(chunk))
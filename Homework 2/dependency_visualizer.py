@@ -1,12 +1,92 @@
+import argparse
+import cProfile
 import os
+import re
+import fnmatch
+import hashlib
+import sqlite3
 import subprocess
+import sys
 import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+from commit_graph import CommitGraph, iter_plantuml, write_chunks
+from exporters import exporter_class
+from git_backends import RepositoryError, create_backend
+from graph_reduction import collapse_linear_runs, reduce_history
+from history_cache import HistoryCache
+from profiling import NULL_PROFILER, Profiler
+from renderer import PlantUMLRenderer, RenderCache, RenderError, render_files
+
+
+def is_glob(target):
+    return any(char in target for char in '*?[')
+
+
+def build_path_index(history):
+    """Инвертированные индексы по history (номера коммитов по возрастанию).
+
+    Возвращает (путь -> номера коммитов, новый путь -> [(номер, старый путь)]).
+    """
+    path_index = {}
+    rename_index = {}
+    for position, (_, _, _, files, renames, _) in enumerate(history):
+        for path in files:
+            path_index.setdefault(path, []).append(position)
+        for old_path, new_path in renames:
+            rename_index.setdefault(new_path, []).append((position, old_path))
+    return path_index, rename_index
+
+
+def normalize_target(target):
+    # Путь относительно корня репозитория с прямыми слешами, как в git
+    target = target.replace('\\', '/')
+    while target.startswith('./'):
+        target = target[2:]
+    return target.rstrip('/') if target != '/' else ''
+
+
+def matches_target(path, target):
+    """Путь совпадает с целью или лежит в каталоге цели (как git log -- <путь>)."""
+    return not target or path == target or path.startswith(target + '/')
+
+
+def parse_date(value):
+    """Дата ISO 8601 из конфигурации в секундах Unix (без пояса - местное время)."""
+    if value is None:
+        return None
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def target_slug(target):
+    # Часть имени файла графа: все, кроме букв, цифр, '.', '_' и '-', заменяется на '_'
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', target).strip('_')
+
+
+def follow_renames(path_index, rename_index, path):
+    """Номера коммитов пути с учетом переименований (как git log --follow).
+
+    История идет от новых коммитов к старым, поэтому после переименования
+    old -> new старому имени принадлежат только коммиты с большими номерами.
+    """
+    positions = set(path_index.get(path, ()))
+    pending = [(path, -1)]
+    while pending:
+        path, newest = pending.pop()
+        for position, old_path in rename_index.get(path, ()):
+            if position > newest:
+                positions.update(old_position for old_position in path_index.get(old_path, ())
+                                 if old_position > position)
+                pending.append((old_path, position))
+    return positions
+
 
 class DependencyVisualizer:
-    def __init__(self, config_path):
+    def __init__(self, config_path, profiler=NULL_PROFILER):
         self.config_path = config_path
+        self.profiler = profiler  # Время этапов и счетчики подпроцессов (--profile)
         self.load_config()
 
     def load_config(self):
@@ -18,81 +98,382 @@ class DependencyVisualizer:
         self.output_path = Path(self.config['output_path'])
         self.target_file = self.config['target_file']
 
-    def get_commits_with_file(self):
-        # Получаем все коммиты с их родителями и сообщениями
-        command = [
-            'git', '-C', str(self.repository_path), 'log', '--pretty=format:%H %P %s', '--all'
-        ]
+        # target_file может быть путем, каталогом, glob-шаблоном или списком путей и шаблонов
+        targets = self.target_file if isinstance(self.target_file, list) else [self.target_file]
+        self.targets = [normalize_target(target) for target in targets]
+        self.follow_renames = self.config.get('follow_renames', False)  # История файла до переименований
+        self.multiple_targets = len(targets) > 1 or any(is_glob(target) for target in targets)
+        self.workers = self.config.get('workers')  # Потоки для записи графов нескольких целей
+
+        # Упрощение графа: только затрагивающие коммиты, связанные с ближайшими
+        # затрагивающими предками; глубина и интервал дат ограничивают граф.
+        # collapse_linear (линейные участки - одна вершина) тоже включает
+        # упрощение: без него между затрагивающими коммитами почти нет цепочек
+        self.max_depth = self.config.get('max_depth')
+        self.since = parse_date(self.config.get('since'))
+        self.until = parse_date(self.config.get('until'))
+        self.collapse_linear = self.config.get('collapse_linear', False)
+        self.reduce = self.config.get('reduce', False) or self.collapse_linear or any(
+            value is not None for value in (self.max_depth, self.since, self.until))
+
+        # Формат файла графа: plantuml, dot, ndjson или binary. При потоковой записи
+        # коммиты пишутся в файл по мере обхода истории, без вывода графа в консоль,
+        # и поэтому в порядке git log (от новых к старым), а не от старых к новым
+        self.output_format = self.config.get('output_format', 'plantuml')
+        self.exporter_class = exporter_class(self.output_format)
+        self.streaming = self.config.get('stream', False) or self.output_format != 'plantuml'
+
+        # Рендеринг .puml в изображения одним процессом PlantUML (java -jar graph_visualizer_path -pipe)
+        self.render = self.config.get('render', False)
+        self.render_format = self.config.get('render_format', 'png')
+        self.render_command = self.config.get(
+            'render_command', ['java', '-Djava.awt.headless=true', '-jar', str(self.graph_visualizer_path)])
+        self.render_cache_dir = Path(self.config.get('render_cache_dir', self.output_path.parent / '.render-cache'))
+        self.renderer = None  # Процесс PlantUML запускается при первом рендеринге
+
+        # Кэш просмотренной истории по умолчанию лежит рядом с выходным файлом
+        self.use_cache = self.config.get('use_cache', True)
+        self.cache_path = Path(self.config.get('cache_path', str(self.output_path) + '.cache.sqlite'))
+        self.last_scan = None  # 'full' или 'incremental' - как была получена история
+
+        # 'subprocess' - команды git, 'native' - чтение объектов из .git напрямую
+        self.backend = create_backend(self.config.get('backend', 'subprocess'), self.repository_path, self.profiler)
+
+    def load_history(self):
+        """Возвращает всю историю (хэш, родители, сообщение, файлы, переименования, время)."""
+        return list(self.iter_history())
+
+    def iter_history(self):
+        """Выдает историю коммит за коммитом с учетом кэша.
+
+        Если все ссылки с прошлого запуска только продвинулись вперед, читаются
+        лишь новые коммиты (git log --all ^старые_вершины). Удаленная или
+        переписанная ссылка (force push, rebase) приводит к полному просмотру.
+        Коммиты из git выдаются сразу по мере чтения; при полном просмотре
+        они по пути записываются в кэш, при частичном - новые коммиты
+        добавляются в кэш, а вся история читается из него курсором.
+        """
+        refs = self.backend.ref_tips()
+        if not self.use_cache:
+            self.last_scan = 'full'
+            yield from self.backend.iter_history()
+            return
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            cache = HistoryCache(self.cache_path)
+        except sqlite3.DatabaseError:
+            self.cache_path.unlink()  # Поврежденный кэш создается заново
+            cache = HistoryCache(self.cache_path)
+
         try:
-            result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8')
-            all_commits = result.stdout.strip().split('\n')
+            repository = str(self.repository_path.resolve())
+            cached_refs = cache.load_refs() if cache.get_meta('repository') == repository else {}
+            if cached_refs and not self.history_rewritten(cached_refs, refs):
+                new_commits = list(self.backend.iter_history(exclude=set(cached_refs.values())))
+                cache.extend(new_commits, refs)
+                self.last_scan = 'incremental'
+                yield from cache.load_commits()
+            else:
+                self.last_scan = 'full'
+                yield from cache.iter_replace(repository, self.backend.iter_history(), refs)
+        finally:
+            cache.close()
+
+    def history_rewritten(self, old_refs, new_refs):
+        """Проверяет, что какая-то ссылка удалена или сдвинута не вперед по истории."""
+        for name, old_hash in old_refs.items():
+            new_hash = new_refs.get(name)
+            if new_hash is None:
+                return True
+            if new_hash != old_hash and not self.backend.is_ancestor(old_hash, new_hash):
+                return True
+        return False
 
-            commits_with_file = []
-            for line in all_commits:
-                parts = line.split(" ")
-                commit_hash = parts[0]
-                parents = " ".join(parts[1:-1])  # Родители
-                commit_message = parts[-1]  # Сообщение коммита
+    def get_commits_with_file(self):
+        # Коммиты, затрагивающие хотя бы одну из целей, в порядке истории
+        matched = self.match_targets()
+        if matched is None:
+            return None
+        history, positions_by_target = matched
+        return self.select_commits(history, sorted(set().union(*positions_by_target.values())))
 
-                # Проверяем, что коммит затрагивает нужный файл
-                show_command = [
-                    'git', '-C', str(self.repository_path), 'show', '--name-only', '--pretty=format:', commit_hash
-                ]
-                show_result = subprocess.run(show_command, capture_output=True, text=True, check=True, encoding='utf-8')
+    def iter_commits_with_file(self):
+        """Коммиты единственной цели по мере обхода истории, без индекса путей."""
+        target = self.targets[0]
+        for commit_hash, parents, message, files, _, _ in self.iter_history():
+            if any(fnmatch.fnmatchcase(path, target) if is_glob(target) else matches_target(path, target)
+                   for path in files):
+                yield commit_hash, parents, message
+
+    def get_commits_by_target(self):
+        """Возвращает словарь: цель -> коммиты (хэш, родители, сообщение), затрагивающие ее."""
+        matched = self.match_targets()
+        if matched is None:
+            return None
+        history, positions_by_target = matched
+        return {
+            target: self.select_commits(history, positions)
+            for target, positions in positions_by_target.items()
+        }
 
-                if self.target_file in show_result.stdout:
-                    commits_with_file.append((commit_hash, parents, commit_message))
+    def select_commits(self, history, positions):
+        """Коммиты для графа: как есть или упрощенные (reduce, max_depth, since/until, collapse_linear)."""
+        with self.profiler.stage('reduce'):
+            if self.reduce:
+                commits = reduce_history(history, positions, self.max_depth, self.since, self.until)
+            else:
+                commits = [history[position][:3] for position in positions]
+            if self.collapse_linear:
+                commits = collapse_linear_runs(commits)
+        return commits
 
-            return commits_with_file
+    def match_targets(self):
+        """Возвращает историю и для каждой цели номера затрагивающих ее коммитов.
 
+        История читается один раз (новые коммиты - поверх кэша прошлых запусков),
+        по ней строится индекс путь -> коммиты, и все цели обслуживаются из него.
+        Цель - точный путь от корня репозитория или каталог; glob-шаблоны
+        раскрываются в отдельные цели по путям из истории. Merge-коммит
+        затрагивает путь, если файл отличается хотя бы от одного из родителей.
+        """
+        try:
+            with self.profiler.stage('history'):
+                history = self.load_history()
         except subprocess.CalledProcessError as e:
             print(f"Error running git command: {e}")
             return None
+        except RepositoryError as e:
+            print(f"Error reading repository: {e}")
+            return None
+
+        with self.profiler.stage('match'):
+            path_index, rename_index = build_path_index(history)
+            positions_by_target = {}
+            for target in self.expand_targets(path_index):
+                # Файл ищется напрямую, каталог - по всем путям внутри него
+                if target in path_index:
+                    paths = [target]
+                else:
+                    paths = [path for path in path_index if matches_target(path, target)]
+                positions = set()
+                for path in paths:
+                    if self.follow_renames:
+                        positions.update(follow_renames(path_index, rename_index, path))
+                    else:
+                        positions.update(path_index[path])
+                positions_by_target[target] = sorted(positions)
+        return history, positions_by_target
+
+    def expand_targets(self, path_index):
+        """Раскрывает glob-шаблоны в пути из истории, сохраняя порядок и без повторов."""
+        targets = {}
+        for target in self.targets:
+            if is_glob(target):
+                targets.update(dict.fromkeys(sorted(path for path in path_index if fnmatch.fnmatchcase(path, target))))
+            else:
+                targets[target] = None
+        return list(targets)
+
+    def output_path_for(self, target, slug=None):
+        """Путь .puml для цели: output_path для одной цели, иначе output_<цель>.puml."""
+        if not self.multiple_targets:
+            return self.output_path
+        slug = slug or target_slug(target)
+        return self.output_path.with_name(f"{self.output_path.stem}_{slug}{self.output_path.suffix}")
+
+    def output_paths_for(self, targets):
+        """Пути .puml для набора целей без совпадений.
+
+        Разные цели могут дать одно имя файла (a/b.py и a_b.py -> a_b.py, или
+        A.py и a.py в нечувствительной к регистру ФС); таким целям к имени
+        добавляется короткий хэш исходного пути.
+        """
+        slugs = {target: target_slug(target) for target in targets}
+        counts = {}
+        for slug in slugs.values():
+            counts[slug.casefold()] = counts.get(slug.casefold(), 0) + 1
+        paths = {}
+        for target, slug in slugs.items():
+            if counts[slug.casefold()] > 1:
+                digest = hashlib.blake2b(target.encode('utf-8', 'surrogateescape'), digest_size=4).hexdigest()
+                slug = f'{slug}_{digest}'
+            paths[target] = self.output_path_for(target, slug)
+        return paths
+
+    def build_commit_graph(self, commits):
+        # Строим DAG за один проход: хэш -> индекс, родители - массивы индексов
+        with self.profiler.stage('build_graph'):
+            return CommitGraph.from_commits(commits)
 
     def build_graph(self, commits):
-        graph = "@startuml\n"
-        graph += "skinparam linetype ortho\n"
-        graph += "skinparam monochrome true\n"
-
-        # Маппим хэши на их сообщения
-        commit_map = {commit[0]: commit[2] for commit in commits}
-        commit_order = [commit[0] for commit in commits]  # Порядок коммитов от старых к новым
-
-        # Строим граф с зависимостями
-        for commit_hash in reversed(commit_order):  # Переворачиваем, чтобы выводить от старого к новому
-            commit_message = commit_map[commit_hash]
-            graph += f'"{commit_hash}" : "{commit_message}"\n'
-
-            # Получаем родителей и строим зависимости для каждого родителя
-            parents = next((parents for commit, parents, _ in commits if commit == commit_hash), None)
-            if parents:
-                parent_list = parents.split()  # Разделяем по пробелам, чтобы учесть несколько родителей
-                for parent in parent_list:
-                    graph += f'"{parent}" --> "{commit_hash}"\n'
-
-        graph += "@enduml\n"
-        return graph
-
-    def save_graph(self, graph):
-        self.output_path.parent.mkdir(parents=True, exist_ok=True)  # Создаем директорию, если она не существует
-        with open(self.output_path, 'w', encoding='utf-8') as file:
-            file.write(graph)
+        # Текст PlantUML целиком; для больших графов лучше передавать
+        # CommitGraph прямо в save_graph/display_graph, которые пишут его потоком
+        return ''.join(iter_plantuml(self.build_commit_graph(commits)))
+
+    def save_graph(self, graph, output_path=None):
+        output_path = Path(output_path or self.output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)  # Создаем директорию, если она не существует
+        with self.profiler.stage('save'), open(output_path, 'w', encoding='utf-8') as file:
+            if isinstance(graph, CommitGraph):
+                write_chunks(iter_plantuml(graph), file)
+            else:
+                file.write(graph)
 
     def display_graph(self, graph):
-        print(graph)
+        with self.profiler.stage('display'):
+            if isinstance(graph, CommitGraph):
+                write_chunks(iter_plantuml(graph), sys.stdout)
+                print()
+            else:
+                print(graph)
+
+    def export_commits(self, commits, output_path=None):
+        """Пишет коммиты в output_format по одному; возвращает их число.
+
+        Если commits - генератор, этап export включает и обход истории.
+        """
+        output_path = Path(output_path or self.output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.exporter_class.binary:
+            file = open(output_path, 'wb')
+        else:
+            file = open(output_path, 'w', encoding='utf-8')
+        with self.profiler.stage('export'), file:
+            return self.exporter_class(file).write_all(commits)
+
+    def save_target_graph(self, target, commits, output_path=None):
+        output_path = output_path or self.output_path_for(target)
+        if self.streaming:
+            self.export_commits(commits, output_path)
+        else:
+            self.save_graph(self.build_commit_graph(commits), output_path)
+        return output_path
+
+    def render_engine_id(self):
+        # Другая версия jar дает другие изображения, поэтому входит в ключ кэша
+        try:
+            stat = self.graph_visualizer_path.stat()
+            return f'{self.graph_visualizer_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}'
+        except OSError:
+            return ' '.join(self.render_command)
+
+    def render_graphs(self, puml_paths):
+        """Рендерит файлы .puml в изображения render_format; возвращает их пути."""
+        if self.renderer is None:
+            self.renderer = PlantUMLRenderer(self.render_command, self.render_format, self.profiler)
+        cache = RenderCache(self.render_cache_dir, self.render_format, self.render_engine_id())
+        try:
+            with self.profiler.stage('render'):
+                image_paths, cached = render_files(self.renderer, cache, puml_paths)
+        except RenderError as e:
+            print(f"Error rendering graph: {e}")
+            return []
+        print(f"Rendered {len(image_paths)} graph(s), {cached} from cache")
+        return image_paths
+
+    def close(self):
+        if self.renderer is not None:
+            self.renderer.close()
+            self.renderer = None
+        self.backend.close()
 
     def run(self):
+        try:
+            self.run_targets()
+        finally:
+            self.close()
+
+    def run_targets(self):
+        if self.multiple_targets:
+            self.run_multiple_targets()
+            return
+        if self.streaming:
+            self.run_streaming()
+            return
+
         # Получение данных о коммитах, где фигурирует целевой файл
         commits = self.get_commits_with_file()
         if commits:
-            graph = self.build_graph(commits)  # Построение графа
+            graph = self.build_commit_graph(commits)  # Построение графа
             self.display_graph(graph)  # Вывод графа в консоль
             self.save_graph(graph)  # Сохранение графа в файл
             print(f"Graph saved to {self.output_path}")
+            if self.render:
+                self.render_graphs([self.output_path])
         else:
             print("No commits found for the specified file.")
 
+    def run_streaming(self):
+        # Без упрощения графа и переименований коммиты идут в файл прямо из обхода истории
+        if self.reduce or self.follow_renames:
+            commits = self.get_commits_with_file()
+            if commits is None:
+                return
+        else:
+            commits = self.iter_commits_with_file()
+        try:
+            count = self.export_commits(commits)
+        except subprocess.CalledProcessError as e:
+            print(f"Error running git command: {e}")
+            return
+        except RepositoryError as e:
+            print(f"Error reading repository: {e}")
+            return
+        if count:
+            print(f"Graph saved to {self.output_path}")
+            if self.render and self.output_format == 'plantuml':
+                self.render_graphs([self.output_path])
+        else:
+            print("No commits found for the specified file.")
+
+    def run_multiple_targets(self):
+        # Один проход по истории на все цели, графы записываются параллельно
+        commits_by_target = self.get_commits_by_target()
+        if commits_by_target is None:
+            return
+        output_paths = self.output_paths_for(commits_by_target)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                target: executor.submit(self.save_target_graph, target, commits, output_paths[target])
+                for target, commits in commits_by_target.items() if commits
+            }
+        for target, commits in commits_by_target.items():
+            if target in futures:
+                print(f"Graph for {target} saved to {futures[target].result()}")
+            else:
+                print(f"No commits found for {target}.")
+        if not commits_by_target:
+            print("No files in the history match the specified targets.")
+        if self.render and self.output_format == 'plantuml' and futures:
+            # Все графы - одним пакетом в одном процессе PlantUML
+            self.render_graphs([future.result() for future in futures.values()])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Visualize the commit graph of a file in a git repository")
+    parser.add_argument("config", nargs="?", default="config.json", help="Path to the JSON configuration")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="Write a JSON report with per-stage timings, subprocess counts and peak memory "
+                             "('-' prints it to stdout)")
+    parser.add_argument("--cprofile", metavar="STATS", help="Also run under cProfile and save pstats data to STATS")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Track the peak of Python allocations in the report (slows the run down)")
+    args = parser.parse_args(argv)
+
+    profiler = Profiler(trace_memory=args.tracemalloc) if args.profile or args.tracemalloc else NULL_PROFILER
+    visualizer = DependencyVisualizer(args.config, profiler)
+    if args.cprofile:
+        cProfile.runctx('visualizer.run()', globals(), {'visualizer': visualizer}, args.cprofile)
+    else:
+        visualizer.run()
+    if profiler.enabled:
+        extra = {'config': args.config, 'backend': visualizer.config.get('backend', 'subprocess'),
+                 'history_scan': visualizer.last_scan}
+        if args.cprofile:
+            extra['cprofile'] = args.cprofile
+        profiler.write_report(args.profile or '-', extra)
+
 
 if __name__ == "__main__":
-    visualizer = DependencyVisualizer('config.json')
-    visualizer.run()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,161 @@
+import json
+
+from commit_graph import PLANTUML_FOOTER, PLANTUML_HEADER
+
+
+BINARY_MAGIC = b'CGADJ\x00\x01\n'  # Сигнатура и версия двоичного формата смежности
+
+
+class Exporter:
+    """Потоковая запись графа: коммиты пишутся по одному по мере обхода истории.
+
+    Экспортер не хранит ни коммитов, ни индекса хэшей, поэтому память не
+    зависит от размера репозитория, а данные попадают в файл (или канал)
+    порциями по размеру буфера, пока обход еще идет. Коммиты приходят в
+    порядке git log (от новых к старым), ребра ведут от родителя к коммиту.
+    """
+
+    binary = False
+
+    def __init__(self, file):
+        self.file = file
+
+    def begin(self):
+        pass
+
+    def write_commit(self, commit_hash, parents, message):
+        raise NotImplementedError
+
+    def end(self):
+        pass
+
+    def write_all(self, commits):
+        """Записывает коммиты (хэш, родители через пробел, сообщение) целиком; возвращает их число."""
+        self.begin()
+        count = 0
+        for commit_hash, parents, message in commits:
+            self.write_commit(commit_hash, parents.split(), message)
+            count += 1
+        self.end()
+        return count
+
+
+class PlantUMLExporter(Exporter):
+    """PlantUML с теми же строками вершин и ребер, что и iter_plantuml.
+
+    iter_plantuml (save_graph) выводит коммиты от старых к новым, а здесь
+    они идут в порядке обхода - от новых к старым: чтобы развернуть порядок,
+    пришлось бы дождаться конца истории. Граф тот же, отличается только
+    порядок блоков коммитов в файле.
+    """
+
+    def begin(self):
+        self.file.write(PLANTUML_HEADER)
+
+    def write_commit(self, commit_hash, parents, message):
+        self.file.write(f'"{commit_hash}" : "{message}"\n' +
+                        ''.join(f'"{parent}" --> "{commit_hash}"\n' for parent in parents))
+
+    def end(self):
+        self.file.write(PLANTUML_FOOTER)
+
+
+class DotExporter(Exporter):
+    """Graphviz DOT: вершины с подписями-сообщениями и ребра родитель -> коммит."""
+
+    def begin(self):
+        self.file.write('digraph commits {\n    node [shape=box];\n')
+
+    def write_commit(self, commit_hash, parents, message):
+        self.file.write(f'    "{commit_hash}" [label={json.dumps(message, ensure_ascii=False)}];\n' +
+                        ''.join(f'    "{parent}" -> "{commit_hash}";\n' for parent in parents))
+
+    def end(self):
+        self.file.write('}\n')
+
+
+class NDJSONExporter(Exporter):
+    """Строка JSON на вершину ({"type": "commit"}) и на каждое ребро ({"type": "edge"})."""
+
+    def write_commit(self, commit_hash, parents, message):
+        # Хэши - шестнадцатеричные строки, экранировать в них нечего
+        self.file.write(json.dumps({'type': 'commit', 'hash': commit_hash, 'message': message}, ensure_ascii=False) +
+                        '\n' + ''.join(f'{{"type": "edge", "from": "{parent}", "to": "{commit_hash}"}}\n'
+                                       for parent in parents))
+
+
+class BinaryAdjacencyExporter(Exporter):
+    """Компактный двоичный список смежности.
+
+    После сигнатуры BINARY_MAGIC идут записи: хэш коммита (20 байт),
+    число родителей (uvarint), хэши родителей (по 20 байт), длина
+    сообщения в UTF-8 (uvarint) и само сообщение.
+    """
+
+    binary = True
+
+    def begin(self):
+        self.file.write(BINARY_MAGIC)
+
+    def write_commit(self, commit_hash, parents, message):
+        message = message.encode('utf-8')
+        self.file.write(b''.join((
+            bytes.fromhex(commit_hash), encode_uvarint(len(parents)),
+            *(bytes.fromhex(parent) for parent in parents),
+            encode_uvarint(len(message)), message,
+        )))
+
+
+def encode_uvarint(value):
+    result = bytearray()
+    while value >= 0x80:
+        result.append(value & 0x7f | 0x80)
+        value >>= 7
+    result.append(value)
+    return bytes(result)
+
+
+def read_uvarint(file):
+    value = shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            raise EOFError('Truncated varint')
+        value |= (byte[0] & 0x7f) << shift
+        shift += 7
+        if not byte[0] & 0x80:
+            return value
+
+
+def read_binary_adjacency(file):
+    """Читает двоичный формат потоком: (хэш, список родителей, сообщение)."""
+    if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError('Not a binary adjacency file')
+    while True:
+        commit_sha = file.read(20)
+        if not commit_sha:
+            return
+        if len(commit_sha) != 20:
+            raise EOFError('Truncated commit record')
+        parents = [file.read(20).hex() for _ in range(read_uvarint(file))]
+        message = file.read(read_uvarint(file)).decode('utf-8')
+        yield commit_sha.hex(), parents, message
+
+
+EXPORTERS = {
+    'plantuml': PlantUMLExporter,
+    'dot': DotExporter,
+    'ndjson': NDJSONExporter,
+    'binary': BinaryAdjacencyExporter,
+}
+
+
+def exporter_class(output_format):
+    try:
+        return EXPORTERS[output_format]
+    except KeyError:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of: {', '.join(EXPORTERS)}") from None
+
+
+def create_exporter(output_format, file):
+    return exporter_class(output_format)(file)
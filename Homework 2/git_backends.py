@@ -0,0 +1,656 @@
+import heapq
+import mmap
+import os
+import re
+import struct
+import subprocess
+import tempfile
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from profiling import NULL_PROFILER
+
+
+COMMIT_MARKER = '\x1e'  # Начало записи коммита в выводе git log
+FIELD_SEPARATOR = '\x1f'  # Разделитель хэша, родителей, времени и сообщения
+
+
+class RepositoryError(Exception):
+    """Репозиторий не найден или его объекты не удается прочитать."""
+
+
+def iter_git_log(repository_path, *args, stdin_revisions=None, profiler=NULL_PROFILER):
+    """Читает вывод git log --name-status потоком, коммит за коммитом.
+
+    Возвращает кортежи (хэш, родители через пробел, сообщение, файлы,
+    переименования, время коммита в секундах Unix). Файлы - отсортированные пути, измененные относительно
+    хотя бы одного родителя: merge-коммит сравнивается с каждым родителем (-m).
+    Порядок --date-order: родители всегда идут после своих потомков.
+    Переименования - пары (старый путь, новый путь), найденные git; оба пути
+    входят и в список файлов. Пути с не-ASCII символами выводятся как есть;
+    байты, не являющиеся UTF-8, сохраняются как суррогаты (surrogateescape).
+    stdin_revisions - дополнительные ревизии (например, '^хэш'), передаваемые
+    через --stdin, чтобы не упираться в длину командной строки.
+    profiler учитывает запуск git и объем его вывода.
+    """
+    command = [
+        'git', '-C', str(repository_path), '-c', 'core.quotePath=false', 'log', '--date-order', '-m',
+        '--name-status', '--find-renames',
+        f'--pretty=format:{COMMIT_MARKER}%H{FIELD_SEPARATOR}%P{FIELD_SEPARATOR}%ct{FIELD_SEPARATOR}%s', *args
+    ]
+    if stdin_revisions is not None:
+        command.append('--stdin')
+    # stderr - файл, а не канал: переполненный канал остановил бы git, пока мы ждем stdout
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdin=subprocess.PIPE if stdin_revisions is not None else None,
+                                   stdout=subprocess.PIPE, stderr=stderr)
+        profiler.count_subprocess()
+        finished = False
+        try:
+            if stdin_revisions is not None:
+                # git читает весь stdin до начала вывода, поэтому записать его сразу безопасно
+                process.stdin.write(''.join(f'{revision}\n' for revision in stdin_revisions).encode('utf-8'))
+                process.stdin.close()
+            commit = None
+            # Пути выводятся байтами как есть; не-UTF-8 имена декодируются так же, как decode_path
+            for line in profiler.text_stream(process.stdout, errors='surrogateescape'):
+                line = line.rstrip('\n')
+                if line.startswith(COMMIT_MARKER):
+                    commit_hash, parents, commit_time, message = line[1:].split(FIELD_SEPARATOR, 3)
+                    if commit is not None and commit[0] == commit_hash:
+                        continue  # С -m merge-коммит выводится отдельно для каждого родителя
+                    if commit is not None:
+                        yield finish_commit(commit)
+                    commit = (commit_hash, parents, message, set(), set(), int(commit_time))
+                elif line and commit is not None:
+                    status, *paths = line.split('\t')
+                    commit[3].update(paths)
+                    if status.startswith('R'):
+                        commit[4].add((paths[0], paths[1]))
+            if commit is not None:
+                yield finish_commit(commit)
+            finished = True
+        finally:
+            # Брошенный на середине обход (или ошибка разбора) не оставляет процесс git
+            if not finished:
+                process.terminate()
+            process.stdout.close()
+            process.wait()
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, command,
+                                                stderr=stderr.read().decode('utf-8', 'replace'))
+
+
+def finish_commit(commit):
+    commit_hash, parents, message, files, renames, commit_time = commit
+    return commit_hash, parents, message, sorted(files), sorted(renames), commit_time
+
+
+def get_ref_tips(repository_path, profiler=NULL_PROFILER):
+    """Возвращает вершины всех ссылок и HEAD: имя ссылки -> хэш."""
+    command = ['git', '-C', str(repository_path), 'show-ref', '--head']
+    result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8')
+    profiler.count_subprocess()
+    profiler.count_bytes(len(result.stdout.encode('utf-8')))
+    if result.returncode == 1 and not result.stdout:
+        # show-ref завершается с кодом 1, если ссылок нет; проверяем, что это репозиторий
+        subprocess.run(['git', '-C', str(repository_path), 'rev-parse', '--git-dir'],
+                       capture_output=True, check=True)
+        profiler.count_subprocess()
+        return {}
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, command, stderr=result.stderr)
+    refs = {}
+    for line in result.stdout.splitlines():
+        commit_hash, name = line.split(' ', 1)
+        refs[name] = commit_hash
+    return refs
+
+
+def is_ancestor(repository_path, ancestor, descendant, profiler=NULL_PROFILER):
+    """Проверяет, что ancestor достижим из descendant (ложь, если объекта уже нет)."""
+    command = ['git', '-C', str(repository_path), 'merge-base', '--is-ancestor', ancestor, descendant]
+    profiler.count_subprocess()
+    return subprocess.run(command, capture_output=True).returncode == 0
+
+
+class SubprocessBackend:
+    """Доступ к истории через команды git (по процессу на запрос)."""
+
+    def __init__(self, repository_path, profiler=NULL_PROFILER):
+        self.repository_path = Path(repository_path)
+        self.profiler = profiler
+
+    def ref_tips(self):
+        return get_ref_tips(self.repository_path, self.profiler)
+
+    def is_ancestor(self, ancestor, descendant):
+        return is_ancestor(self.repository_path, ancestor, descendant, self.profiler)
+
+    def iter_history(self, exclude=()):
+        """Коммиты всех ссылок, кроме достижимых из exclude, в порядке git log."""
+        exclude = [f'^{commit_hash}' for commit_hash in exclude]
+        return iter_git_log(self.repository_path, '--all', stdin_revisions=exclude or None, profiler=self.profiler)
+
+    def close(self):
+        pass
+
+
+OBJECT_TYPES = {1: 'commit', 2: 'tree', 3: 'blob', 4: 'tag'}
+OFS_DELTA = 6
+REF_DELTA = 7
+PACK_INDEX_MAGIC = b'\xfftOc'
+TREE_MODE = b'40000'
+DELTA_BASE_CACHE_SIZE = 32 * 1024 * 1024  # Байт распакованных баз дельт в кэше пака
+TREE_CACHE_SIZE = 4096  # Разобранных деревьев в кэше
+TREE_ENTRY = re.compile(rb'(\d+) ([^\0]*)\0(.{20})', re.DOTALL)  # Запись дерева: режим, имя, хэш
+
+
+def apply_delta(base, delta):
+    """Восстанавливает объект из базы и дельты git (копирование и вставка)."""
+    def read_size(position):
+        size = shift = 0
+        while True:
+            byte = delta[position]
+            position += 1
+            size |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                return size, position
+
+    base_size, position = read_size(0)
+    if base_size != len(base):
+        raise RepositoryError('Delta base size mismatch')
+    result_size, position = read_size(position)
+    result = bytearray()
+    while position < len(delta):
+        opcode = delta[position]
+        position += 1
+        if opcode & 0x80:
+            # Копирование из базы: байты смещения и длины присутствуют по битам opcode
+            offset = size = 0
+            for i in range(4):
+                if opcode & (1 << i):
+                    offset |= delta[position] << (8 * i)
+                    position += 1
+            for i in range(3):
+                if opcode & (0x10 << i):
+                    size |= delta[position] << (8 * i)
+                    position += 1
+            result += base[offset:offset + (size or 0x10000)]
+        elif opcode:
+            result += delta[position:position + opcode]
+            position += opcode
+        else:
+            raise RepositoryError('Invalid delta opcode')
+    if len(result) != result_size:
+        raise RepositoryError('Delta result size mismatch')
+    return bytes(result)
+
+
+class PackFile:
+    """Пак git: индекс .idx версии 2 и данные .pack, отображенные в память."""
+
+    def __init__(self, index_path):
+        with open(index_path, 'rb') as index_file:
+            index = index_file.read()
+        if index[:4] != PACK_INDEX_MAGIC or struct.unpack_from('>L', index, 4)[0] != 2:
+            raise RepositoryError(f'Unsupported pack index: {index_path}')
+        self.fanout = struct.unpack_from('>256L', index, 8)
+        count = self.fanout[255]
+        names_start = 8 + 256 * 4
+        self.names = index[names_start:names_start + 20 * count]
+        offsets_start = names_start + 24 * count  # Пропускаем таблицу CRC32
+        self.offsets = struct.unpack_from(f'>{count}L', index, offsets_start)
+        self.large_offsets = index[offsets_start + 4 * count:]
+
+        with open(Path(index_path).with_suffix('.pack'), 'rb') as pack_file:
+            self.mapping = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.base_cache = OrderedDict()  # Смещение -> (тип, данные) для баз дельт
+        self.base_cache_size = 0
+
+    def close(self):
+        self.mapping.close()
+
+    def find(self, sha):
+        """Смещение объекта в паке или None (поиск по fanout и двоичный поиск)."""
+        low = self.fanout[sha[0] - 1] if sha[0] else 0
+        high = self.fanout[sha[0]]
+        names = self.names
+        while low < high:
+            middle = (low + high) // 2
+            name = names[middle * 20:middle * 20 + 20]
+            if name < sha:
+                low = middle + 1
+            elif name > sha:
+                high = middle
+            else:
+                offset = self.offsets[middle]
+                if offset & 0x80000000:
+                    position = (offset & 0x7fffffff) * 8
+                    offset = struct.unpack_from('>Q', self.large_offsets, position)[0]
+                return offset
+        return None
+
+    def read_at(self, offset, store):
+        """Читает объект по смещению, раскрывая цепочку дельт: (тип, данные)."""
+        cached = self.base_cache.get(offset)
+        if cached is not None:
+            self.base_cache.move_to_end(offset)
+            return cached
+
+        mapping = self.mapping
+        byte = mapping[offset]
+        kind = (byte >> 4) & 7
+        size = byte & 0x0f
+        shift = 4
+        position = offset + 1
+        while byte & 0x80:
+            byte = mapping[position]
+            position += 1
+            size |= (byte & 0x7f) << shift
+            shift += 7
+
+        if kind == OFS_DELTA:
+            byte = mapping[position]
+            position += 1
+            distance = byte & 0x7f
+            while byte & 0x80:
+                byte = mapping[position]
+                position += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7f)
+            base_kind, base = self.read_at(offset - distance, store)
+            result = base_kind, apply_delta(base, self.inflate(position, size))
+        elif kind == REF_DELTA:
+            base_kind, base = store.read_object(mapping[position:position + 20])
+            result = base_kind, apply_delta(base, self.inflate(position + 20, size))
+        elif kind in OBJECT_TYPES:
+            result = OBJECT_TYPES[kind], self.inflate(position, size)
+        else:
+            raise RepositoryError(f'Unknown pack object type {kind}')
+
+        self.base_cache[offset] = result
+        self.base_cache_size += len(result[1])
+        while self.base_cache_size > DELTA_BASE_CACHE_SIZE and len(self.base_cache) > 1:
+            self.base_cache_size -= len(self.base_cache.popitem(last=False)[1][1])
+        return result
+
+    def inflate(self, position, size):
+        """Распаковывает zlib-поток с position, не копируя остаток пака."""
+        decompressor = zlib.decompressobj()
+        chunk = max(size + 64, 1024)
+        data = decompressor.decompress(self.mapping[position:position + chunk])
+        while not decompressor.eof:
+            position += chunk
+            if position >= len(self.mapping):
+                raise RepositoryError('Truncated pack object')
+            data += decompressor.decompress(self.mapping[position:position + chunk])
+        return data
+
+
+class ObjectStore:
+    """Объекты репозитория: loose-файлы и паки, включая alternates."""
+
+    def __init__(self, objects_path):
+        self.object_dirs = [Path(objects_path)]
+        alternates = Path(objects_path) / 'info' / 'alternates'
+        if alternates.exists():
+            for line in alternates.read_text(encoding='utf-8').splitlines():
+                if line and not line.startswith('#'):
+                    self.object_dirs.append(Path(objects_path) / line if not os.path.isabs(line) else Path(line))
+        self.packs = [
+            PackFile(index_path)
+            for object_dir in self.object_dirs
+            for index_path in sorted((object_dir / 'pack').glob('*.idx'))
+            if index_path.with_suffix('.pack').exists()
+        ]
+
+    def close(self):
+        for pack in self.packs:
+            pack.close()
+
+    def read_object(self, sha):
+        """Возвращает (тип, данные) объекта по двоичному хэшу (20 байт)."""
+        for pack in self.packs:
+            offset = pack.find(sha)
+            if offset is not None:
+                return pack.read_at(offset, self)
+        object_hash = sha.hex()
+        for object_dir in self.object_dirs:
+            try:
+                with open(object_dir / object_hash[:2] / object_hash[2:], 'rb') as object_file:
+                    raw = zlib.decompress(object_file.read())
+            except FileNotFoundError:
+                continue
+            header, _, data = raw.partition(b'\0')
+            return header.split(b' ', 1)[0].decode(), data
+        raise RepositoryError(f'Object {object_hash} not found')
+
+
+def find_git_dir(repository_path):
+    """Каталог .git (или сам репозиторий, если он bare) и общий каталог для worktree."""
+    path = Path(repository_path)
+    git_dir = path / '.git'
+    if git_dir.is_file():
+        # Worktree или submodule: в файле .git записано 'gitdir: путь'
+        content = git_dir.read_text(encoding='utf-8').strip()
+        if not content.startswith('gitdir:'):
+            raise RepositoryError(f'Invalid .git file in {path}')
+        git_dir = (path / content[len('gitdir:'):].strip()).resolve()
+    elif not git_dir.is_dir():
+        if (path / 'HEAD').is_file() and (path / 'objects').is_dir():
+            git_dir = path
+        else:
+            raise RepositoryError(f'Not a git repository: {path}')
+    common_dir = git_dir
+    if (git_dir / 'commondir').is_file():
+        common_dir = (git_dir / (git_dir / 'commondir').read_text(encoding='utf-8').strip()).resolve()
+    return git_dir, common_dir
+
+
+def decode_path(path):
+    return path.decode('utf-8', 'surrogateescape')
+
+
+def commit_subject(message):
+    """Первый абзац сообщения в одну строку, как %s в git log."""
+    lines = []
+    for line in message.lstrip('\n').split('\n'):
+        line = line.rstrip()
+        if not line:
+            break
+        lines.append(line)
+    return ' '.join(lines)
+
+
+class ObjectStoreBackend:
+    """Чтение истории напрямую из каталога .git, без запуска git.
+
+    Коммиты и деревья читаются из loose-объектов и паков; измененные файлы
+    находятся сравнением деревьев, при котором совпадающие по хэшу поддеревья
+    пропускаются целиком. Результаты совпадают с SubprocessBackend, кроме
+    переименований с правками, которые здесь не распознаются. profiler
+    учитывает объем прочитанных коммитов и деревьев.
+    """
+
+    def __init__(self, repository_path, profiler=NULL_PROFILER):
+        self.repository_path = Path(repository_path)
+        self.profiler = profiler
+        self._store = None  # Открывается при первом обращении
+        self.commits = {}  # Хэш -> (дерево, родители, время коммита, сообщение)
+        self.trees = OrderedDict()  # Хэш дерева -> {имя: (режим, хэш)}
+
+    @property
+    def store(self):
+        if self._store is None:
+            self.git_dir, self.common_dir = find_git_dir(self.repository_path)
+            self._store = ObjectStore(self.common_dir / 'objects')
+            shallow = self.common_dir / 'shallow'
+            self.shallow = set(shallow.read_text().split()) if shallow.exists() else set()
+        return self._store
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def ref_tips(self):
+        """Вершины ссылок, как git show-ref --head: HEAD и refs/* по имени."""
+        self.store  # Находит каталог репозитория
+        refs = {}
+        packed_refs = self.common_dir / 'packed-refs'
+        if packed_refs.exists():
+            for line in packed_refs.read_text(encoding='utf-8').splitlines():
+                if line and line[0] not in '#^':
+                    object_hash, name = line.split(' ', 1)
+                    refs[name] = object_hash
+        refs_dir = self.common_dir / 'refs'
+        for path in refs_dir.rglob('*'):
+            if path.is_file():
+                refs[path.relative_to(self.common_dir).as_posix()] = path.read_text(encoding='utf-8').strip()
+
+        tips = {}
+        head = self.resolve_ref((self.git_dir / 'HEAD').read_text(encoding='utf-8').strip(), refs)
+        if head is not None:
+            tips['HEAD'] = head
+        for name in sorted(refs):
+            object_hash = self.resolve_ref(refs[name], refs)
+            if object_hash is not None:
+                tips[name] = object_hash
+        return tips
+
+    def resolve_ref(self, value, refs):
+        """Раскрывает символьные ссылки 'ref: ...'; None для ссылки без коммитов."""
+        for _ in range(10):
+            if not value.startswith('ref:'):
+                return value
+            name = value[4:].strip()
+            loose = self.git_dir / name
+            value = refs.get(name) or (loose.read_text(encoding='utf-8').strip() if loose.is_file() else None)
+            if value is None:
+                return None
+        return None
+
+    def commit(self, commit_hash):
+        """Разобранный коммит: (дерево, родители, время коммита, сообщение)."""
+        commit = self.commits.get(commit_hash)
+        if commit is None:
+            kind, data = self.store.read_object(bytes.fromhex(commit_hash))
+            if kind != 'commit':
+                raise RepositoryError(f'{commit_hash} is a {kind}, not a commit')
+            self.profiler.count_bytes(len(data))
+            headers, _, message = data.partition(b'\n\n')
+            tree, parents, commit_time = None, [], 0
+            for line in headers.split(b'\n'):
+                if line.startswith(b'tree '):
+                    tree = bytes.fromhex(line[5:].decode())
+                elif line.startswith(b'parent '):
+                    parents.append(line[7:].decode())
+                elif line.startswith(b'committer '):
+                    commit_time = int(line.rsplit(b' ', 2)[1])
+            if commit_hash in self.shallow:
+                parents = []
+            commit = (tree, parents, commit_time, message.decode('utf-8', 'replace'))
+            self.commits[commit_hash] = commit
+        return commit
+
+    def peel(self, object_hash):
+        """Раскрывает аннотированные теги до коммита; None, если это не коммит."""
+        while True:
+            kind, data = self.store.read_object(bytes.fromhex(object_hash))
+            if kind == 'commit':
+                return object_hash
+            if kind != 'tag':
+                return None
+            object_hash = data[7:47].decode()  # Первая строка тега: 'object <хэш>'
+
+    def tree(self, tree_sha):
+        """Записи дерева: имя -> (режим, хэш), с кэшем последних деревьев.
+
+        Имена и хэши остаются байтами: декодируются только выводимые пути.
+        """
+        entries = self.trees.get(tree_sha)
+        if entries is not None:
+            self.trees.move_to_end(tree_sha)
+            return entries
+        data = self.store.read_object(tree_sha)[1]
+        self.profiler.count_bytes(len(data))
+        entries = {name: (mode, sha) for mode, name, sha in TREE_ENTRY.findall(data)}
+        self.trees[tree_sha] = entries
+        if len(self.trees) > TREE_CACHE_SIZE:
+            self.trees.popitem(last=False)
+        return entries
+
+    def tree_files(self, tree_sha, prefix):
+        """Все файлы дерева: (путь, хэш)."""
+        for name, (mode, sha) in self.tree(tree_sha).items():
+            if mode == TREE_MODE:
+                yield from self.tree_files(sha, prefix + name + b'/')
+            else:
+                yield prefix + name, sha
+
+    def diff_trees(self, old_sha, new_sha, prefix=b''):
+        """Различия двух деревьев (None - пустое дерево): (путь, старый хэш, новый хэш).
+
+        Поддеревья с одинаковым хэшем пропускаются без чтения, поэтому
+        стоимость зависит от размера изменения, а не от размера репозитория.
+        Хэш None означает, что файла с этой стороны нет.
+        """
+        if old_sha == new_sha:
+            return
+        old = self.tree(old_sha) if old_sha else {}
+        new = self.tree(new_sha) if new_sha else {}
+        for name in old.keys() | new.keys():
+            old_entry = old.get(name)
+            new_entry = new.get(name)
+            if old_entry == new_entry:
+                continue
+            old_tree = old_entry[1] if old_entry and old_entry[0] == TREE_MODE else None
+            new_tree = new_entry[1] if new_entry and new_entry[0] == TREE_MODE else None
+            if old_tree or new_tree:
+                # Файл, замененный каталогом (или наоборот), считается удаленным/добавленным
+                if old_entry and not old_tree:
+                    yield prefix + name, old_entry[1], None
+                if new_entry and not new_tree:
+                    yield prefix + name, None, new_entry[1]
+                yield from self.diff_trees(old_tree, new_tree, prefix + name + b'/')
+            else:
+                yield prefix + name, old_entry and old_entry[1], new_entry and new_entry[1]
+
+    def changed_files(self, tree, parents):
+        """Файлы и переименования коммита как в git log -m --name-status.
+
+        Файл изменен, если отличается хотя бы от одного родителя. Находятся
+        только точные переименования (удаленный и добавленный файл с одним
+        содержимым); git, кроме того, находит переименования с правками.
+        """
+        if not parents:
+            return sorted(decode_path(path) for path, _ in self.tree_files(tree, b'')), []
+        files = set()
+        renames = set()
+        for parent in parents:
+            deleted = {}
+            added = []
+            for path, old_sha, new_sha in self.diff_trees(self.commit(parent)[0], tree):
+                files.add(path)
+                if new_sha is None:
+                    deleted.setdefault(old_sha, path)
+                elif old_sha is None:
+                    added.append((new_sha, path))
+            for sha, path in added:
+                old_path = deleted.pop(sha, None)
+                if old_path is not None:
+                    renames.add((decode_path(old_path), decode_path(path)))
+        return sorted(decode_path(path) for path in files), sorted(renames)
+
+    def is_ancestor(self, ancestor, descendant):
+        try:
+            ancestor = self.peel(ancestor)
+            start = self.peel(descendant)
+        except RepositoryError:
+            return False
+        if ancestor is None or start is None:
+            return False
+        # Обход от новых к старым: при продвижении ссылки старая вершина находится быстро
+        queue = [(-self.commit(start)[2], start)]
+        seen = {start}
+        while queue:
+            _, commit_hash = heapq.heappop(queue)
+            if commit_hash == ancestor:
+                return True
+            for parent in self.commit(commit_hash)[1]:
+                if parent not in seen:
+                    seen.add(parent)
+                    heapq.heappush(queue, (-self.commit(parent)[2], parent))
+        return False
+
+    def iter_history(self, exclude=()):
+        """Коммиты всех ссылок, кроме достижимых из exclude, от новых к старым.
+
+        Как и git log, обходит коммиты по убыванию времени коммита; исключенные
+        вершины обходятся в той же очереди и помечают своих предков, а обход
+        заканчивается, когда в очереди не остается неисключенных коммитов.
+        Затем коммиты выдаются как с --date-order: ни один родитель не идет
+        раньше своих потомков.
+        """
+        queue = []
+        excluded = set()
+        queued = set()
+        included = set()  # Неисключенные коммиты, ожидающие в очереди
+        counter = 0  # Порядок добавления для коммитов с одинаковым временем
+
+        def push(commit_hash):
+            nonlocal counter
+            if commit_hash not in queued:
+                queued.add(commit_hash)
+                heapq.heappush(queue, (-self.commit(commit_hash)[2], counter, commit_hash))
+                counter += 1
+                if commit_hash not in excluded:
+                    included.add(commit_hash)
+
+        for object_hash in exclude:
+            try:
+                commit_hash = self.peel(object_hash)
+            except RepositoryError:
+                continue  # Исключаемая вершина могла быть удалена сборщиком мусора
+            if commit_hash is not None:
+                excluded.add(commit_hash)
+                push(commit_hash)
+        for object_hash in dict.fromkeys(self.ref_tips().values()):
+            commit_hash = self.peel(object_hash)
+            if commit_hash is not None:
+                push(commit_hash)
+
+        walked = {}  # Хэш -> порядковый номер в обходе по времени
+        while included:
+            _, _, commit_hash = heapq.heappop(queue)
+            included.discard(commit_hash)
+            parents = self.commit(commit_hash)[1]
+            if commit_hash in excluded:
+                excluded.update(parents)
+                included.difference_update(parents)
+            else:
+                walked[commit_hash] = len(walked)
+            for parent in parents:
+                push(parent)
+
+        for commit_hash in self.date_order(walked.keys() - excluded, walked):
+            tree, parents, commit_time, message = self.commit(commit_hash)
+            files, renames = self.changed_files(tree, parents)
+            yield commit_hash, ' '.join(parents), commit_subject(message), files, renames, commit_time
+
+    def date_order(self, commits, walk_order):
+        """Топологическая сортировка: потомки раньше родителей, иначе по времени."""
+        children = dict.fromkeys(commits, 0)
+        for commit_hash in commits:
+            for parent in self.commit(commit_hash)[1]:
+                if parent in children:
+                    children[parent] += 1
+        ready = [(-self.commit(commit_hash)[2], walk_order[commit_hash], commit_hash)
+                 for commit_hash, count in children.items() if not count]
+        heapq.heapify(ready)
+        while ready:
+            commit_hash = heapq.heappop(ready)[2]
+            yield commit_hash
+            for parent in self.commit(commit_hash)[1]:
+                if parent in children:
+                    children[parent] -= 1
+                    if not children[parent]:
+                        heapq.heappush(ready, (-self.commit(parent)[2], walk_order[parent], parent))
+
+
+BACKENDS = {
+    'subprocess': SubprocessBackend,
+    'native': ObjectStoreBackend,
+}
+
+
+def create_backend(name, repository_path, profiler=NULL_PROFILER):
+    """Создает бэкенд доступа к истории по имени из конфигурации."""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown git backend '{name}', expected one of: {', '.join(BACKENDS)}") from None
+    return backend_class(repository_path, profiler)
@@ -0,0 +1,101 @@
+from collections import deque
+
+
+def reduce_history(history, positions, max_depth=None, since=None, until=None):
+    """Упрощает историю до коммитов, затрагивающих цель.
+
+    history - коммиты (хэш, родители, сообщение, файлы, переименования, время)
+    в порядке --date-order, positions - номера затрагивающих коммитов.
+    Каждый оставшийся коммит связывается с ближайшими затрагивающими
+    предками, как при упрощении истории в git log -- <путь>. since и until
+    (секунды Unix) ограничивают время коммитов, max_depth - число уровней
+    от самых новых коммитов (0 - только они).
+
+    Возвращает кортежи (хэш, новые родители через пробел, сообщение).
+    """
+    touching = {
+        position for position in positions
+        if (since is None or history[position][5] >= since) and (until is None or history[position][5] <= until)
+    }
+    index = {commit[0]: position for position, commit in enumerate(history)}
+
+    # Родители всегда идут после потомков, поэтому от старых к новым
+    # ближайшие затрагивающие предки родителя уже известны.
+    # Для цепочек незатрагивающих коммитов кортеж не копируется, а переиспользуется.
+    nearest = {}
+    reduced_parents = {}
+    for position in reversed(range(len(history))):
+        ancestors = []
+        parents = [index[parent] for parent in history[position][1].split() if parent in index]
+        if len(parents) == 1 and parents[0] not in touching:
+            ancestors = nearest[parents[0]]
+        else:
+            for parent in parents:
+                ancestors.extend((parent,) if parent in touching else nearest[parent])
+            ancestors = tuple(dict.fromkeys(ancestors))
+        if position in touching:
+            reduced_parents[position] = ancestors
+            nearest[position] = (position,)
+        else:
+            nearest[position] = ancestors
+
+    kept = sorted(reduced_parents)
+    if max_depth is not None:
+        kept = sorted(limit_depth(reduced_parents, max_depth))
+    kept_set = set(kept)
+    return [
+        (history[position][0],
+         ' '.join(history[parent][0] for parent in reduced_parents[position] if parent in kept_set),
+         history[position][2])
+        for position in kept
+    ]
+
+
+def limit_depth(reduced_parents, max_depth):
+    """Коммиты не дальше max_depth шагов от коммитов без затрагивающих потомков."""
+    has_children = {parent for parents in reduced_parents.values() for parent in parents}
+    depth = {position: 0 for position in reduced_parents if position not in has_children}
+    queue = deque(depth)
+    while queue:
+        position = queue.popleft()
+        if depth[position] == max_depth:
+            continue
+        for parent in reduced_parents[position]:
+            if parent not in depth:
+                depth[parent] = depth[position] + 1
+                queue.append(parent)
+    return depth
+
+
+def collapse_linear_runs(commits):
+    """Сворачивает линейные участки в одну вершину.
+
+    Участок - цепочка коммитов, где у каждого один родитель, а у родителя
+    один потомок. Вершина участка получает хэш самого нового коммита,
+    родителей самого старого и сообщение 'новое ... старое (N commits)'.
+    commits - кортежи (хэш, родители через пробел, сообщение) от новых к старым.
+    """
+    by_hash = {commit[0]: commit for commit in commits}
+    children = {}
+    for commit_hash, parents, _ in commits:
+        for parent in parents.split():
+            children.setdefault(parent, []).append(commit_hash)
+
+    def absorbed(commit_hash):
+        # Коммит входит в участок своего единственного потомка
+        child = children.get(commit_hash)
+        return child is not None and len(child) == 1 and by_hash[child[0]][1] == commit_hash
+
+    collapsed = []
+    for commit_hash, parents, message in commits:
+        if absorbed(commit_hash):
+            continue
+        run_length = 1
+        tail = by_hash[commit_hash]
+        while tail[1] in by_hash and absorbed(tail[1]):
+            tail = by_hash[tail[1]]
+            run_length += 1
+        if run_length > 1:
+            message = f'{message} ... {tail[2]} ({run_length} commits)'
+        collapsed.append((commit_hash, tail[1], message))
+    return collapsed
@@ -0,0 +1,98 @@
+import sqlite3
+
+
+SCHEMA_VERSION = '4'  # Кэш другой версии пересоздается
+
+
+class HistoryCache:
+    """Кэш просмотренной истории git в SQLite.
+
+    Хранит коммиты (родители, сообщение, измененные файлы, переименования,
+    время) в порядке git log и вершины ссылок, которые были видны при последнем просмотре.
+    Пути хранятся байтами (BLOB): имена файлов не обязаны быть UTF-8.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        if self.get_meta('schema') != SCHEMA_VERSION:
+            self.connection.executescript('''
+                DROP TABLE IF EXISTS refs;
+                DROP TABLE IF EXISTS commits;
+                DELETE FROM meta;
+            ''')
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS refs (name TEXT PRIMARY KEY, hash TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS commits (
+                hash TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                parents TEXT NOT NULL,
+                message TEXT NOT NULL,
+                files BLOB NOT NULL,
+                renames BLOB NOT NULL,
+                time INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS commits_seq ON commits (seq);
+        ''')
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('schema', SCHEMA_VERSION))
+
+    def close(self):
+        self.connection.close()
+
+    def get_meta(self, key):
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def load_refs(self):
+        """Возвращает вершины ссылок с прошлого просмотра: имя -> хэш."""
+        return dict(self.connection.execute('SELECT name, hash FROM refs'))
+
+    def load_commits(self):
+        """Возвращает коммиты в порядке git log: (хэш, родители, сообщение, файлы, переименования, время)."""
+        rows = self.connection.execute('SELECT hash, parents, message, files, renames, time FROM commits ORDER BY seq')
+        for commit_hash, parents, message, files, renames, commit_time in rows:
+            files = files.decode('utf-8', 'surrogateescape')
+            renames = renames.decode('utf-8', 'surrogateescape')
+            yield (commit_hash, parents, message, files.split('\n') if files else [],
+                   [tuple(rename.split('\t')) for rename in renames.split('\n')] if renames else [], commit_time)
+
+    def replace(self, repository, commits, refs):
+        """Полностью заменяет содержимое кэша результатом полного просмотра."""
+        for _ in self.iter_replace(repository, commits, refs):
+            pass
+
+    def iter_replace(self, repository, commits, refs):
+        """Заменяет содержимое кэша, выдавая коммиты по мере их записи.
+
+        Потребитель получает коммит сразу, не дожидаясь конца обхода.
+        Транзакция фиксируется, только если коммиты прочитаны до конца:
+        брошенный на середине обход откатывает кэш к прежнему состоянию.
+        """
+        with self.connection:
+            self.connection.execute('DELETE FROM commits')
+            self.connection.execute('DELETE FROM refs')
+            self.connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('repository', repository))
+            for seq, commit in enumerate(commits):
+                self.connection.execute('INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        commit_row(commit, seq))
+                yield commit
+            self.connection.executemany('INSERT INTO refs VALUES (?, ?)', refs.items())
+
+    def extend(self, commits, refs):
+        """Добавляет новые коммиты перед уже известными и обновляет вершины ссылок."""
+        with self.connection:
+            first_seq = self.connection.execute('SELECT COALESCE(MIN(seq), 0) FROM commits').fetchone()[0]
+            self.connection.executemany('INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        (commit_row(commit, first_seq - len(commits) + i)
+                                         for i, commit in enumerate(commits)))
+            self.connection.execute('DELETE FROM refs')
+            self.connection.executemany('INSERT INTO refs VALUES (?, ?)', refs.items())
+
+
+def commit_row(commit, seq):
+    commit_hash, parents, message, files, renames, commit_time = commit
+    return (commit_hash, seq, parents, message, '\n'.join(files).encode('utf-8', 'surrogateescape'),
+            '\n'.join(f'{old_path}\t{new_path}' for old_path, new_path in renames).encode('utf-8', 'surrogateescape'),
+            commit_time)
@@ -0,0 +1,138 @@
+import io
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: пиковый RSS недоступен
+    resource = None
+
+
+class NullProfiler:
+    """Профилировщик по умолчанию: ничего не измеряет и почти ничего не стоит."""
+
+    enabled = False
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def count_subprocess(self):
+        pass
+
+    def count_bytes(self, size):
+        pass
+
+    def text_stream(self, stream, encoding='utf-8', errors='strict'):
+        """Текстовое чтение двоичного потока (например, stdout подпроцесса)."""
+        return io.TextIOWrapper(stream, encoding=encoding, errors=errors)
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class CountingReader(io.RawIOBase):
+    """Двоичный поток, сообщающий профилировщику число прочитанных байтов."""
+
+    def __init__(self, stream, profiler):
+        self.stream = stream
+        self.profiler = profiler
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self.stream.readinto1(buffer)  # Не ждем заполнения всего буфера
+        if size:
+            self.profiler.count_bytes(size)
+        return size
+
+
+class Profiler(NullProfiler):
+    """Время этапов (настенное и CPU), запуски подпроцессов, прочитанные байты и память.
+
+    CPU считается по потоку, выполняющему этап (time.thread_time), поэтому
+    этапы в пуле потоков не засчитывают чужую работу; CPU подпроцессов
+    (git, PlantUML) сюда не входит - для них есть счетчики запусков и байтов.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        self.stages = {}  # Имя -> [настенное время, CPU, число вызовов]
+        self.subprocesses = 0
+        self.bytes_read = 0
+        self.lock = threading.Lock()
+        self.trace_memory = trace_memory
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        if trace_memory:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            with self.lock:
+                totals = self.stages.setdefault(name, [0.0, 0.0, 0])
+                totals[0] += wall
+                totals[1] += cpu
+                totals[2] += 1
+
+    def count_subprocess(self):
+        with self.lock:
+            self.subprocesses += 1
+
+    def count_bytes(self, size):
+        with self.lock:
+            self.bytes_read += size
+
+    def text_stream(self, stream, encoding='utf-8', errors='strict'):
+        # Байты считаются при заполнении буфера, а не на каждой строке
+        return io.TextIOWrapper(io.BufferedReader(CountingReader(stream, self)), encoding=encoding, errors=errors)
+
+    def report(self):
+        """Отчет в виде словаря, готового для json.dump."""
+        report = {
+            'total': {
+                'wall_seconds': time.perf_counter() - self.started,
+                'cpu_seconds': time.process_time() - self.started_cpu,
+            },
+            'stages': {
+                name: {'wall_seconds': wall, 'cpu_seconds': cpu, 'calls': calls}
+                for name, (wall, cpu, calls) in self.stages.items()
+            },
+            'subprocesses': {'count': self.subprocesses, 'bytes_read': self.bytes_read},
+            'peak_rss_bytes': None,
+        }
+        if resource is not None:
+            # ru_maxrss - в КБ на Linux и в байтах на macOS
+            scale = 1 if sys.platform == 'darwin' else 1024
+            report['peak_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        if self.trace_memory and tracemalloc.is_tracing():
+            report['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        return report
+
+    def write_report(self, path, extra=None):
+        """Пишет отчет JSON в файл или в stdout, если path - '-'."""
+        report = self.report()
+        if extra:
+            report.update(extra)
+        if self.trace_memory:
+            tracemalloc.stop()
+        text = json.dumps(report, indent=2)
+        if path == '-':
+            print(text)
+        else:
+            with open(path, 'w', encoding='utf-8') as report_file:
+                report_file.write(text + '\n')
+        return report
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+from profiling import NULL_PROFILER
+
+
+PIPE_DELIMITER = b'--8<-- plantuml pipe delimiter --8<--'  # Разделитель изображений в выводе -pipe
+
+
+class RenderError(Exception):
+    """PlantUML не запустился или завершился, не выдав изображение."""
+
+
+class PlantUMLRenderer:
+    """Долгоживущий процесс PlantUML в режиме -pipe.
+
+    JVM запускается один раз при первом рендеринге, а затем получает
+    документы через stdin и возвращает изображения в stdout, разделяя их
+    строкой PIPE_DELIMITER (-pipedelimitor). command - команда запуска без
+    параметров режима, например ['java', '-jar', 'plantuml.jar']. profiler
+    учитывает запуски процесса и объем полученных изображений.
+    """
+
+    def __init__(self, command, output_format='png', profiler=NULL_PROFILER):
+        self.command = [*command, '-pipe', f'-t{output_format}', '-pipedelimitor', PIPE_DELIMITER.decode()]
+        self.process = None
+        self.buffer = bytearray()
+        self.stderr = None
+        self.starts = 0  # Сколько раз запускался процесс
+        self.profiler = profiler
+
+    def start(self):
+        self.close()
+        self.stderr = tempfile.TemporaryFile()  # Файл, а не канал: переполненный канал остановил бы JVM
+        try:
+            self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=self.stderr)
+        except OSError as e:
+            raise RenderError(f"Cannot start PlantUML ({self.command[0]}): {e}") from e
+        self.buffer.clear()
+        self.starts += 1
+        self.profiler.count_subprocess()
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process = None
+        if self.stderr is not None:
+            self.stderr.close()
+            self.stderr = None
+
+    def render_all(self, sources):
+        """Рендерит документы PlantUML по порядку; возвращает список изображений.
+
+        Документы пишутся в stdin отдельным потоком, пока основной читает
+        изображения, поэтому заполненные буферы каналов не приводят к
+        взаимной блокировке.
+        """
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+
+        def write_sources():
+            try:
+                for source in sources:
+                    self.process.stdin.write(source.encode('utf-8') + (b'' if source.endswith('\n') else b'\n'))
+                    self.process.stdin.flush()
+            except OSError:
+                pass  # Процесс завершился; причину сообщит read_image по его stderr
+
+        writer = threading.Thread(target=write_sources, daemon=True)
+        writer.start()
+        try:
+            return [self.read_image() for _ in sources]
+        finally:
+            writer.join()
+
+    def read_image(self):
+        while True:
+            index = self.buffer.find(PIPE_DELIMITER)
+            if index >= 0:
+                image = bytes(self.buffer[:index])
+                del self.buffer[:index + len(PIPE_DELIMITER)]
+                # Разделитель выводится через println: перевод строки остается в начале следующего изображения
+                if image.startswith(b'\r\n'):
+                    image = image[2:]
+                elif image.startswith(b'\n'):
+                    image = image[1:]
+                return image
+            chunk = os.read(self.process.stdout.fileno(), 65536)
+            if not chunk:
+                self.stderr.seek(0)
+                message = self.stderr.read().decode('utf-8', 'replace').strip()
+                returncode = self.process.wait()
+                self.process = None
+                raise RenderError(f"PlantUML exited with code {returncode} before finishing the image: {message}")
+            self.profiler.count_bytes(len(chunk))
+            self.buffer += chunk
+
+
+class RenderCache:
+    """Готовые изображения по хэшу содержимого документа.
+
+    Ключ включает текст .puml, формат изображения и идентификатор движка
+    (например, размер и время изменения jar), поэтому неизменившийся граф
+    повторно не рендерится, а смена версии PlantUML сбрасывает кэш.
+    """
+
+    def __init__(self, directory, output_format, engine_id):
+        self.directory = Path(directory)
+        self.output_format = output_format
+        self.engine_id = engine_id
+
+    def key(self, source):
+        digest = hashlib.blake2b(digest_size=20)
+        for part in (self.engine_id, self.output_format, source):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key):
+        return self.directory / f'{key}.{self.output_format}'
+
+    def get(self, key):
+        path = self.path(key)
+        return path if path.exists() else None
+
+    def put(self, key, image):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        temp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        temp_path.write_bytes(image)
+        os.replace(temp_path, path)
+        return path
+
+
+def render_files(renderer, cache, puml_paths):
+    """Рендерит .puml рядом с исходниками (graph.puml -> graph.png).
+
+    Изображения из кэша копируются, остальные рендерятся одним пакетом в
+    одном процессе PlantUML. Возвращает (пути изображений, число из кэша).
+    """
+    image_paths = []
+    missing = {}  # Ключ -> (текст, пути изображений с этим содержимым)
+    cached = 0
+    for puml_path in puml_paths:
+        puml_path = Path(puml_path)
+        source = puml_path.read_text(encoding='utf-8')
+        image_path = puml_path.with_suffix(f'.{cache.output_format}')
+        image_paths.append(image_path)
+        key = cache.key(source)
+        cached_path = cache.get(key)
+        if cached_path is not None:
+            shutil.copyfile(cached_path, image_path)
+            cached += 1
+        else:
+            missing.setdefault(key, (source, []))[1].append(image_path)
+
+    if missing:
+        images = renderer.render_all([source for source, _ in missing.values()])
+        for (key, (_, targets)), image in zip(missing.items(), images):
+            cache.put(key, image)
+            for image_path in targets:
+                image_path.write_bytes(image)
+    return image_paths, cached
@@ -0,0 +1,37 @@
+"""Заменитель PlantUML для тестов: тот же протокол -pipe, без Java.
+
+На каждый документ выводит SVG с хэшем текста и разделитель. Если задана
+переменная FAKE_PLANTUML_LOG, дописывает в этот файл 'start' при запуске
+и 'render' на каждый документ.
+"""
+import hashlib
+import os
+import sys
+
+
+def log(event):
+    log_path = os.environ.get('FAKE_PLANTUML_LOG')
+    if log_path:
+        with open(log_path, 'a', encoding='utf-8') as log_file:
+            log_file.write(event + '\n')
+
+
+def main():
+    delimiter = sys.argv[sys.argv.index('-pipedelimitor') + 1]
+    log('start')
+    document = []
+    for line in sys.stdin:
+        document.append(line)
+        if line.strip() == '@enduml':
+            digest = hashlib.sha1(''.join(document).encode('utf-8')).hexdigest()
+            if any('@error' in part for part in document):
+                sys.stderr.write('Syntax error in diagram\n')
+                sys.exit(1)
+            sys.stdout.write(f'<svg><!-- {digest} --></svg>\n{delimiter}\n')
+            sys.stdout.flush()
+            log('render')
+            document = []
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,80 @@
 from io import StringIO
 import unittest
 import os
+import json
+import subprocess
+import tempfile
 from pathlib import Path
 import sys
-from dependency_visualizer import DependencyVisualizer
+from unittest import mock
+from dependency_visualizer import DependencyVisualizer, main
+from commit_graph import PLANTUML_FOOTER, PLANTUML_HEADER, CommitGraph
+import git_backends
+from git_backends import ObjectStoreBackend, SubprocessBackend, iter_git_log
+from graph_reduction import collapse_linear_runs, reduce_history
+from exporters import create_exporter, read_binary_adjacency
+from io import BytesIO
+from renderer import PlantUMLRenderer, RenderError
+from profiling import Profiler
+
+
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME='Test', GIT_AUTHOR_EMAIL='test@example.com',
+               GIT_COMMITTER_NAME='Test', GIT_COMMITTER_EMAIL='test@example.com')
+
+
+def git(repository_path, *args):
+    result = subprocess.run(['git', '-C', str(repository_path), *args], capture_output=True, text=True,
+                            check=True, env=GIT_ENV)
+    return result.stdout.strip()
+
+
+def commit_files(repository_path, message, files):
+    for name, content in files.items():
+        file_path = Path(repository_path) / name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content, encoding='utf-8')
+    git(repository_path, 'add', '-A')
+    git(repository_path, 'commit', '-q', '-m', message)
+    return git(repository_path, 'rev-parse', 'HEAD')
+
+
+def create_repository(repository_path):
+    """Создает тестовый репозиторий: ветка, merge и коммит без example.py.
+
+    Возвращает словарь: сообщение коммита -> хэш.
+    """
+    git(repository_path, 'init', '-q', '-b', 'master')
+    hashes = {'A': commit_files(repository_path, 'A', {'example.py': '1\n'})}
+    git(repository_path, 'checkout', '-q', '-b', 'feature')
+    hashes['B two words'] = commit_files(repository_path, 'B two words', {'example.py': '2\n'})
+    git(repository_path, 'checkout', '-q', 'master')
+    hashes['C'] = commit_files(repository_path, 'C', {'other.txt': 'x\n'})
+    git(repository_path, 'merge', '-q', '--no-ff', '-m', 'merge', 'feature')
+    hashes['merge'] = git(repository_path, 'rev-parse', 'HEAD')
+    return hashes
+
+
+def commit_blocks(plantuml):
+    """Блоки PlantUML по коммитам: строка вершины и ребра от ее родителей."""
+    blocks = []
+    for line in plantuml[len(PLANTUML_HEADER):-len(PLANTUML_FOOTER)].splitlines(keepends=True):
+        if ' : ' in line:
+            blocks.append(line)
+        else:
+            blocks[-1] += line
+    return blocks
+
+
+def make_visualizer(temp_dir, repository_path, target_file='example.py', **options):
+    config_path = Path(temp_dir) / 'config.json'
+    config_path.write_text(json.dumps({
+        'graph_visualizer_path': 'plantuml.jar',
+        'repository_path': str(repository_path),
+        'output_path': str(Path(temp_dir) / 'output.puml'),
+        'target_file': target_file,
+        **options,
+    }), encoding='utf-8')
+    return DependencyVisualizer(str(config_path))
 
 
 class TestDependencyVisualizer(unittest.TestCase):
@@ -116,5 +187,497 @@ class TestDependencyVisualizer(unittest.TestCase):
             self.fail(f"Method run() raised an exception unexpectedly: {e}")
 
 
+class TestCommitGraph(unittest.TestCase):
+    commits = [
+        ("hashMerge", "hashB hashC", "Merge Message"),
+        ("hashC", "hashA", "Message C"),
+        ("hashB", "hashA", "Message B"),
+        ("hashA", "hashRoot", "Message A"),  # Родитель вне выборки
+    ]
+
+    def test_parent_indices(self):
+        graph = CommitGraph.from_commits(self.commits)
+        self.assertEqual(len(graph), 4)
+        merge_parents = [graph.hashes[i] for i in graph.parents(0)]
+        self.assertEqual(merge_parents, ["hashB", "hashC"])
+        root = graph.index["hashRoot"]
+        self.assertIsNone(graph.messages[root])
+        self.assertNotIn(root, graph.commits)
+
+    def test_streamed_save_matches_text(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            visualizer = make_visualizer(temp_dir, temp_dir)
+            visualizer.save_graph(visualizer.build_commit_graph(self.commits))
+            saved = visualizer.output_path.read_text(encoding='utf-8')
+        self.assertEqual(saved, visualizer.build_graph(self.commits))
+        self.assertIn('"hashRoot" --> "hashA"', saved)
+        self.assertLess(saved.index('"hashA" :'), saved.index('"hashMerge" :'))
+
+
+class TestHistoryScan(unittest.TestCase):
+    """Проверки на локальном репозитории, создаваемом в тесте."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.repository_path = Path(cls.temp_dir.name) / 'repo'
+        cls.repository_path.mkdir()
+        cls.hashes = create_repository(cls.repository_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_single_pass_history(self):
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path)
+        commits = visualizer.get_commits_with_file()
+        hashes = self.hashes
+        self.assertCountEqual(commits, [
+            (hashes['A'], '', 'A'),
+            (hashes['B two words'], hashes['A'], 'B two words'),
+            # Merge приносит изменение example.py из feature относительно C
+            (hashes['merge'], f"{hashes['C']} {hashes['B two words']}", 'merge'),
+        ])
+
+    def test_file_in_one_commit(self):
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path, 'other.txt')
+        commits = visualizer.get_commits_with_file()
+        self.assertEqual([commit[2] for commit in commits], ['merge', 'C'])
+        self.assertEqual(commits[1], (self.hashes['C'], self.hashes['A'], 'C'))
+
+    def test_multiple_targets(self):
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path, ['example.py', '*.txt', 'missing.c'])
+        commits_by_target = visualizer.get_commits_by_target()
+        self.assertEqual(list(commits_by_target), ['example.py', 'other.txt', 'missing.c'])
+        self.assertEqual(len(commits_by_target['example.py']), 3)
+        self.assertEqual(commits_by_target['other.txt'][1], (self.hashes['C'], self.hashes['A'], 'C'))
+        self.assertEqual(commits_by_target['missing.c'], [])
+        self.assertEqual(len(visualizer.get_commits_with_file()), 4)
+
+    def test_run_multiple_targets(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            visualizer = make_visualizer(temp_dir, self.repository_path, ['example.py', 'other.txt'])
+            original_stdout = sys.stdout
+            sys.stdout = captured_output = StringIO()
+            try:
+                visualizer.run()
+            finally:
+                sys.stdout = original_stdout
+            self.assertIn('output_example.py.puml', captured_output.getvalue())
+            self.assertFalse((Path(temp_dir) / 'output.puml').exists())
+            content = (Path(temp_dir) / 'output_other.txt.puml').read_text(encoding='utf-8')
+            self.assertIn(f'"{self.hashes["C"]}" : "C"', content)
+            self.assertIn('"B two words"', (Path(temp_dir) / 'output_example.py.puml').read_text(encoding='utf-8'))
+
+    def test_colliding_output_names(self):
+        # a/b.py и a_b.py дают одно имя файла: оба получают хэш пути, уникальная цель - нет
+        with tempfile.TemporaryDirectory() as temp_dir:
+            visualizer = make_visualizer(temp_dir, self.repository_path, ['a/b.py', 'a_b.py', 'example.py'])
+            paths = visualizer.output_paths_for(['a/b.py', 'a_b.py', 'example.py'])
+            self.assertNotEqual(paths['a/b.py'], paths['a_b.py'])
+            self.assertTrue(paths['a/b.py'].name.startswith('output_a_b.py_'))
+            self.assertEqual(paths['example.py'].name, 'output_example.py.puml')
+
+
+class TestHistoryCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repository_path = Path(self.temp_dir.name) / 'repo'
+        self.repository_path.mkdir()
+        self.hashes = create_repository(self.repository_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_incremental_scan(self):
+        first = make_visualizer(self.temp_dir.name, self.repository_path).get_commits_with_file()
+        new_hash = commit_files(self.repository_path, 'D', {'example.py': '3\n'})
+
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path)
+        commits = visualizer.get_commits_with_file()
+        self.assertEqual(visualizer.last_scan, 'incremental')
+        self.assertEqual(commits, [(new_hash, self.hashes['merge'], 'D')] + first)
+        self.assertTrue(visualizer.cache_path.exists())
+
+    def test_rewritten_history_triggers_full_scan(self):
+        make_visualizer(self.temp_dir.name, self.repository_path).get_commits_with_file()
+        git(self.repository_path, 'reset', '-q', '--hard', self.hashes['C'])
+        git(self.repository_path, 'branch', '-q', '-D', 'feature')
+
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path)
+        commits = visualizer.get_commits_with_file()
+        self.assertEqual(visualizer.last_scan, 'full')
+        self.assertEqual(commits, [(self.hashes['A'], '', 'A')])
+
+    def test_full_scan_yields_while_caching(self):
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path)
+        read = []
+        backend_history = visualizer.backend.iter_history
+
+        def iter_history(exclude=()):
+            for commit in backend_history(exclude):
+                read.append(commit[0])
+                yield commit
+
+        visualizer.backend.iter_history = iter_history
+        history = visualizer.iter_history()
+        # Первый коммит выдается до конца обхода; брошенный обход не оставляет кэша
+        self.assertEqual(next(history)[0], self.hashes['merge'])
+        self.assertEqual(read, [self.hashes['merge']])
+        history.close()
+        for last_scan in ('full', 'incremental'):
+            visualizer = make_visualizer(self.temp_dir.name, self.repository_path)
+            self.assertEqual(len(visualizer.load_history()), 4)
+            self.assertEqual(visualizer.last_scan, last_scan)
+
+    def test_corrupt_cache_is_recreated(self):
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path)
+        visualizer.cache_path.write_bytes(b'not a database' * 100)
+        self.assertEqual(len(visualizer.get_commits_with_file()), 3)
+        self.assertEqual(visualizer.last_scan, 'full')
+
+
+class TestPathMatching(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repository_path = Path(self.temp_dir.name) / 'repo'
+        self.repository_path.mkdir()
+        self.hashes = create_repository(self.repository_path)
+        self.hashes['backup'] = commit_files(self.repository_path, 'backup', {'old_example.py.bak': '1\n'})
+        self.hashes['nested'] = commit_files(self.repository_path, 'nested', {'src/example.py': '1\n'})
+        git(self.repository_path, 'mv', 'example.py', 'renamed.py')
+        git(self.repository_path, 'commit', '-q', '-m', 'rename')
+        self.hashes['rename'] = git(self.repository_path, 'rev-parse', 'HEAD')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def messages(self, target, **options):
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path, target, **options)
+        return [commit[2] for commit in visualizer.get_commits_with_file()]
+
+    def test_exact_path(self):
+        # Ни old_example.py.bak, ни src/example.py не совпадают с example.py
+        self.assertCountEqual(self.messages('example.py'), ['rename', 'merge', 'B two words', 'A'])
+        self.assertCountEqual(self.messages('./example.py'), ['rename', 'merge', 'B two words', 'A'])
+        self.assertEqual(self.messages('src/example.py'), ['nested'])
+
+    def test_directory_target(self):
+        self.assertEqual(self.messages('src'), ['nested'])
+        self.assertEqual(self.messages('src/'), ['nested'])
+
+    def test_follow_renames(self):
+        self.assertEqual(self.messages('renamed.py'), ['rename'])
+        self.assertCountEqual(self.messages('renamed.py', follow_renames=True),
+                              ['rename', 'merge', 'B two words', 'A'])
+
+    def test_native_backend_follows_renames(self):
+        self.assertCountEqual(self.messages('renamed.py', follow_renames=True, backend='native', use_cache=False),
+                              ['rename', 'merge', 'B two words', 'A'])
+
+
+class TestGraphReduction(unittest.TestCase):
+    # Линейная история c5 -> ... -> c0 (от новых к старым), цель меняют c4, c2 и c0
+    history = [(f'c{i}', f'c{i - 1}' if i else '', f'm{i}', [], [], 1000 + i) for i in reversed(range(6))]
+    touching = [1, 3, 5]
+
+    def test_nearest_touching_ancestors(self):
+        self.assertEqual(reduce_history(self.history, self.touching),
+                         [('c4', 'c2', 'm4'), ('c2', 'c0', 'm2'), ('c0', '', 'm0')])
+
+    def test_depth_and_date_limits(self):
+        self.assertEqual(reduce_history(self.history, self.touching, max_depth=1),
+                         [('c4', 'c2', 'm4'), ('c2', '', 'm2')])
+        self.assertEqual(reduce_history(self.history, self.touching, since=1001, until=1003),
+                         [('c2', '', 'm2')])
+
+    def test_collapse_linear_runs(self):
+        commits = reduce_history(self.history, self.touching)
+        self.assertEqual(collapse_linear_runs(commits), [('c4', '', 'm4 ... m0 (3 commits)')])
+        # Ветвление не сворачивается: у A два потомка
+        commits = [('M', 'B C', 'merge'), ('C', 'A', 'c'), ('B', 'A', 'b'), ('A', '', 'a')]
+        self.assertEqual(collapse_linear_runs(commits), commits)
+
+    def test_reduced_repository_graph(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            repository_path = Path(temp_dir) / 'repo'
+            repository_path.mkdir()
+            hashes = create_repository(repository_path)
+            visualizer = make_visualizer(temp_dir, repository_path, reduce=True)
+            commits = visualizer.get_commits_with_file()
+        # C не меняет example.py, поэтому merge связан с A через него напрямую
+        self.assertEqual(commits, [
+            (hashes['merge'], f"{hashes['A']} {hashes['B two words']}", 'merge'),
+            (hashes['B two words'], hashes['A'], 'B two words'),
+            (hashes['A'], '', 'A'),
+        ])
+
+    def test_collapse_linear_implies_reduce(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            repository_path = Path(temp_dir) / 'repo'
+            repository_path.mkdir()
+            git(repository_path, 'init', '-q', '-b', 'master')
+            commit_files(repository_path, 'A', {'example.py': '1\n'})
+            commit_files(repository_path, 'B', {'other.txt': 'x\n'})
+            last = commit_files(repository_path, 'C', {'example.py': '2\n'})
+            visualizer = make_visualizer(temp_dir, repository_path, collapse_linear=True)
+            self.assertTrue(visualizer.reduce)
+            commits = visualizer.get_commits_with_file()
+        # B не меняет example.py, поэтому C и A - одна линейная цепочка
+        self.assertEqual(commits, [(last, '', 'C ... A (2 commits)')])
+
+
+class TestExporters(unittest.TestCase):
+    commits = [('b' * 40, 'a' * 40, 'Second "quoted"'), ('a' * 40, '', 'First')]
+
+    def export(self, output_format):
+        output = BytesIO() if output_format == 'binary' else StringIO()
+        self.assertEqual(create_exporter(output_format, output).write_all(self.commits), 2)
+        return output.getvalue()
+
+    def test_plantuml(self):
+        text = self.export('plantuml')
+        self.assertTrue(text.startswith('@startuml') and text.endswith('@enduml\n'))
+        self.assertIn(f'"{"a" * 40}" --> "{"b" * 40}"', text)
+
+    def test_dot(self):
+        text = self.export('dot')
+        self.assertIn(f'"{"b" * 40}" [label="Second \\"quoted\\""];', text)
+        self.assertIn(f'"{"a" * 40}" -> "{"b" * 40}";', text)
+
+    def test_ndjson(self):
+        records = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        self.assertEqual([record['type'] for record in records], ['commit', 'edge', 'commit'])
+        self.assertEqual(records[1], {'type': 'edge', 'from': 'a' * 40, 'to': 'b' * 40})
+
+    def test_binary_round_trip(self):
+        data = self.export('binary')
+        self.assertEqual(list(read_binary_adjacency(BytesIO(data))),
+                         [('b' * 40, ['a' * 40], 'Second "quoted"'), ('a' * 40, [], 'First')])
+
+    def test_streaming_run(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            repository_path = Path(temp_dir) / 'repo'
+            repository_path.mkdir()
+            hashes = create_repository(repository_path)
+            visualizer = make_visualizer(temp_dir, repository_path, output_format='ndjson', use_cache=False)
+            original_stdout = sys.stdout
+            sys.stdout = StringIO()
+            try:
+                visualizer.run()
+            finally:
+                sys.stdout = original_stdout
+            lines = visualizer.output_path.read_text(encoding='utf-8').splitlines()
+        commits = [json.loads(line)['hash'] for line in lines if json.loads(line)['type'] == 'commit']
+        self.assertEqual(commits, [hashes['merge'], hashes['B two words'], hashes['A']])
+
+    def test_streamed_plantuml_order(self):
+        # Потоковый PlantUML - те же блоки коммитов, что и save_graph, но от новых к старым
+        with tempfile.TemporaryDirectory() as temp_dir:
+            repository_path = Path(temp_dir) / 'repo'
+            repository_path.mkdir()
+            create_repository(repository_path)
+            texts = []
+            for stream in (False, True):
+                visualizer = make_visualizer(temp_dir, repository_path, stream=stream, use_cache=False)
+                original_stdout = sys.stdout
+                sys.stdout = StringIO()
+                try:
+                    visualizer.run()
+                finally:
+                    sys.stdout = original_stdout
+                texts.append(visualizer.output_path.read_text(encoding='utf-8'))
+        saved, streamed = (commit_blocks(text) for text in texts)
+        self.assertEqual(len(saved), 3)
+        self.assertEqual(streamed, saved[::-1])
+
+
+FAKE_PLANTUML = [sys.executable, str(Path(__file__).with_name('fake_plantuml.py'))]
+
+
+class TestRenderer(unittest.TestCase):
+    """Рендеринг через заменитель PlantUML с тем же протоколом -pipe."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = Path(self.temp_dir.name) / 'plantuml.log'
+        os.environ['FAKE_PLANTUML_LOG'] = str(self.log_path)
+
+    def tearDown(self):
+        del os.environ['FAKE_PLANTUML_LOG']
+        self.temp_dir.cleanup()
+
+    def events(self):
+        return self.log_path.read_text(encoding='utf-8').split()
+
+    def test_batch_in_one_process(self):
+        renderer = PlantUMLRenderer(FAKE_PLANTUML, 'svg')
+        try:
+            sources = [f'@startuml\n"a" : "{i}"\n@enduml\n' for i in range(50)]
+            images = renderer.render_all(sources)
+            images += renderer.render_all(sources[:2])
+        finally:
+            renderer.close()
+        self.assertEqual(len(images), 52)
+        self.assertEqual(len(set(images)), 50)
+        self.assertTrue(all(image.startswith(b'<svg>') for image in images))
+        self.assertEqual(self.events().count('start'), 1)
+
+    def test_error_is_reported(self):
+        renderer = PlantUMLRenderer(FAKE_PLANTUML, 'svg')
+        try:
+            with self.assertRaisesRegex(RenderError, 'Syntax error'):
+                renderer.render_all(['@startuml\n@error\n@enduml\n'])
+        finally:
+            renderer.close()
+
+    def test_unchanged_graphs_come_from_cache(self):
+        repository_path = Path(self.temp_dir.name) / 'repo'
+        repository_path.mkdir()
+        create_repository(repository_path)
+        output = StringIO()
+        original_stdout = sys.stdout
+        sys.stdout = output
+        try:
+            for _ in range(2):
+                make_visualizer(self.temp_dir.name, repository_path, ['example.py', 'other.txt'],
+                                render=True, render_format='svg', render_command=FAKE_PLANTUML).run()
+        finally:
+            sys.stdout = original_stdout
+        self.assertIn('Rendered 2 graph(s), 0 from cache', output.getvalue())
+        self.assertIn('Rendered 2 graph(s), 2 from cache', output.getvalue())
+        self.assertEqual(self.events(), ['start', 'render', 'render'])
+        self.assertTrue((Path(self.temp_dir.name) / 'output_other.txt.svg').read_bytes().startswith(b'<svg>'))
+
+
+class TestGitBackends(unittest.TestCase):
+    """Чтение объектов из .git должно давать то же, что и команды git."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repository_path = Path(self.temp_dir.name) / 'repo'
+        self.repository_path.mkdir()
+        self.hashes = create_repository(self.repository_path)
+        commit_files(self.repository_path, 'D', {'src/deep/module.py': '1\n', 'другой.txt': 'y\n'})
+        git(self.repository_path, 'tag', '-a', 'v1', '-m', 'tag', self.hashes['C'])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def assertSameHistory(self):
+        subprocess_backend = SubprocessBackend(self.repository_path)
+        native_backend = ObjectStoreBackend(self.repository_path)
+        try:
+            self.assertEqual(native_backend.ref_tips(), subprocess_backend.ref_tips())
+            expected = sorted(subprocess_backend.iter_history())
+            self.assertEqual(sorted(native_backend.iter_history()), expected)
+            exclude = [self.hashes['merge']]
+            self.assertEqual(sorted(native_backend.iter_history(exclude)),
+                             sorted(subprocess_backend.iter_history(exclude)))
+            self.assertTrue(native_backend.is_ancestor(self.hashes['A'], self.hashes['merge']))
+            self.assertFalse(native_backend.is_ancestor(self.hashes['merge'], self.hashes['A']))
+        finally:
+            native_backend.close()
+
+    def test_loose_objects(self):
+        self.assertSameHistory()
+
+    def test_packed_objects(self):
+        # После gc объекты лежат в паке с дельтами, а ссылки - в packed-refs
+        git(self.repository_path, 'gc', '-q', '--aggressive')
+        self.assertSameHistory()
+
+    def test_git_log_process_is_cleaned_up(self):
+        processes = []
+        popen = subprocess.Popen
+
+        def record_popen(*args, **kwargs):
+            processes.append(popen(*args, **kwargs))
+            return processes[-1]
+
+        with mock.patch.object(git_backends.subprocess, 'Popen', record_popen):
+            # Брошенный на середине обход завершает git
+            history = iter_git_log(self.repository_path, '--all')
+            next(history)
+            history.close()
+            self.assertIsNotNone(processes[-1].returncode)
+            # Ошибка git доходит до вызывающего вместе с текстом из stderr
+            with self.assertRaises(subprocess.CalledProcessError) as error:
+                list(iter_git_log(self.repository_path, 'no-such-revision'))
+            self.assertIn('no-such-revision', error.exception.stderr)
+            self.assertIsNotNone(processes[-1].returncode)
+
+    def test_native_backend_in_visualizer(self):
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path, backend='native', use_cache=False)
+        self.assertEqual(len(visualizer.get_commits_with_file()), 3)
+        visualizer = make_visualizer(self.temp_dir.name, self.repository_path, 'src/deep/module.py', backend='native')
+        self.assertEqual(visualizer.get_commits_with_file()[0][2], 'D')
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'Имена файлов не в UTF-8 допускает не каждая ФС')
+    def test_non_utf8_path(self):
+        # Байт 0xff в имени: оба бэкенда отдают его как суррогат, кэш сохраняет его без потерь
+        commit_files(self.repository_path, 'E', {'bad\udcff.txt': '1\n'})
+        self.assertSameHistory()
+        for backend in ('subprocess', 'native'):
+            for use_cache in (False, True, True):
+                visualizer = make_visualizer(self.temp_dir.name, self.repository_path, 'bad\udcff.txt',
+                                             backend=backend, use_cache=use_cache)
+                self.assertEqual([commit[2] for commit in visualizer.get_commits_with_file()], ['E'])
+
+    def test_not_a_repository(self):
+        visualizer = make_visualizer(self.temp_dir.name, self.temp_dir.name, backend='native')
+        original_stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            self.assertIsNone(visualizer.get_commits_with_file())
+        finally:
+            sys.stdout = original_stdout
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            make_visualizer(self.temp_dir.name, self.repository_path, backend='libgit2')
+
+
+class TestProfiling(unittest.TestCase):
+    """Отчет профилирования: этапы, подпроцессы git и прочитанные байты."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repository_path = Path(self.temp_dir.name) / 'repo'
+        self.repository_path.mkdir()
+        create_repository(self.repository_path)
+        self.config_path = make_visualizer(self.temp_dir.name, self.repository_path, use_cache=False).config_path
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_quietly(self, function, *args):
+        original_stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            function(*args)
+        finally:
+            sys.stdout = original_stdout
+
+    def test_stages_and_subprocesses(self):
+        profiler = Profiler()
+        visualizer = DependencyVisualizer(self.config_path, profiler)
+        self.run_quietly(visualizer.run)
+        report = profiler.report()
+        self.assertLessEqual({'history', 'match', 'reduce', 'build_graph', 'display', 'save'}, set(report['stages']))
+        self.assertEqual(report['stages']['history']['calls'], 1)
+        self.assertEqual(report['subprocesses']['count'], 2)  # show-ref и log
+        self.assertGreater(report['subprocesses']['bytes_read'], 0)
+
+    def test_report_from_command_line(self):
+        report_path = Path(self.temp_dir.name) / 'profile.json'
+        self.run_quietly(main, [self.config_path, '--profile', str(report_path), '--tracemalloc'])
+        report = json.loads(report_path.read_text(encoding='utf-8'))
+        self.assertEqual(report['backend'], 'subprocess')
+        self.assertIn('history', report['stages'])
+        self.assertGreater(report['tracemalloc_peak_bytes'], 0)
+        self.assertTrue((Path(self.temp_dir.name) / 'output.puml').exists())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,252 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from config_language import (ConfigSyntaxError, array_to_string, convert_xml_to_custom_language, is_valid_name,
+                             translate_batch, translate_file)
+from config_model import load_config, parse_config
+
+
+def constant_name(index):
+    # Имена допускают только A-Z и _, поэтому номер записывается буквами
+    letters = ''
+    while True:
+        letters = chr(ord('A') + index % 26) + letters
+        index //= 26
+        if not index:
+            return f'CONST_{letters}'
+
+
+def generate_config(constant_count, variable_count):
+    """XML с константами и переменными, каждая из которых ссылается на константу."""
+    lines = ['<config>']
+    lines.extend(f'    <constant name="{constant_name(i)}">{i}</constant>' for i in range(constant_count))
+    lines.extend(
+        f'    <variable name="VAR_{constant_name(i)}">$({constant_name(i % constant_count)}) + 1</variable>'
+        for i in range(variable_count))
+    lines.append('</config>')
+    return '\n'.join(lines)
+
+
+def legacy_convert(xml_root):
+    """Прежняя реализация: re.sub для каждой пары строка x константа."""
+    result = []
+    constants = {}
+    for elem in xml_root:
+        if elem.tag == 'variable':
+            var_name = elem.get('name')
+            if not is_valid_name(var_name):
+                raise ConfigSyntaxError(f"Неверное имя переменной: {var_name}")
+            result.append(f"var {var_name} := {elem.text.strip()};")
+        elif elem.tag == 'array':
+            result.append(array_to_string(elem))
+        elif elem.tag == 'constant':
+            const_name = elem.get('name')
+            const_value = elem.text.strip()
+            if not is_valid_name(const_name):
+                raise ConfigSyntaxError(f"Неверное имя константы: {const_name}")
+            result.append(f"(define {const_name} {const_value})")
+            constants[const_name] = const_value
+        else:
+            raise ConfigSyntaxError(f"Неизвестный элемент: {elem.tag}")
+    for i, line in enumerate(result):
+        for const_name, const_value in constants.items():
+            line = re.sub(r'\$\(' + re.escape(const_name) + r'\)', const_value, line)
+        result[i] = line
+    return '\n'.join(result)
+
+
+def bench_substitute(constant_counts, variable_count, legacy_limit):
+    """Сравнивает подстановку констант за один проход с перебором всех констант для каждой строки."""
+    print(f"{'constants':>10} {'variables':>10} {'new time':>10} {'old time':>10}")
+    for constant_count in constant_counts:
+        root = ET.fromstring(generate_config(constant_count, variable_count))
+        start = time.perf_counter()
+        result = convert_xml_to_custom_language(root)
+        new_time = time.perf_counter() - start
+
+        old = 'skipped'
+        if constant_count * variable_count <= legacy_limit:
+            start = time.perf_counter()
+            legacy_result = legacy_convert(root)
+            old = f'{(time.perf_counter() - start) * 1e3:.0f}ms'
+            if legacy_result != result:
+                raise AssertionError(f"Results differ for {constant_count} constants")
+        print(f"{constant_count:>10} {variable_count:>10} {new_time * 1e3:>8.0f}ms {old:>10}")
+
+
+def measure(func):
+    """Время выполнения и пиковая дополнительная память (tracemalloc, отдельный прогон)."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_stream(variable_counts, constant_count):
+    """Сравнивает потоковый перевод (iterparse) с разбором всего дерева и сборкой вывода в памяти."""
+    print(f"{'variables':>10} {'input':>9} {'tree time':>10} {'tree peak':>10} {'stream time':>12} {'stream peak':>12}")
+    for variable_count in variable_counts:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file = os.path.join(temp_dir, 'input.xml')
+            with open(input_file, 'w', encoding='utf-8') as f:
+                f.write(generate_config(constant_count, variable_count))
+
+            def tree():
+                result = convert_xml_to_custom_language(ET.parse(input_file).getroot())
+                with open(os.path.join(temp_dir, 'tree.txt'), 'w', encoding='utf-8') as f:
+                    f.write(result)
+
+            tree_time, tree_peak = measure(tree)
+            stream_time, stream_peak = measure(lambda: translate_file(input_file, os.path.join(temp_dir, 'stream.txt')))
+            with open(os.path.join(temp_dir, 'tree.txt'), encoding='utf-8') as tree_output, \
+                    open(os.path.join(temp_dir, 'stream.txt'), encoding='utf-8') as stream_output:
+                if tree_output.read() != stream_output.read():
+                    raise AssertionError(f"Results differ for {variable_count} variables")
+            size = os.path.getsize(input_file)
+        print(f"{variable_count:>10} {size / 2 ** 20:>6.1f}MiB {tree_time * 1e3:>8.0f}ms {tree_peak / 2 ** 20:>7.1f}MiB "
+              f"{stream_time * 1e3:>10.0f}ms {stream_peak / 2 ** 20:>9.1f}MiB")
+
+
+def bench_resolve(sizes):
+    """Время вычисления цепочки констант, определенных в обратном порядке (каждая ссылается на следующую)."""
+    print(f"{'constants':>10} {'time':>9} {'per constant':>13}")
+    for size in sizes:
+        lines = ['<config>']
+        lines.extend(f'    <constant name="{constant_name(i)}">$({constant_name(i + 1)}) + 1</constant>'
+                     for i in range(size - 1))
+        lines.append(f'    <constant name="{constant_name(size - 1)}">0</constant>')
+        lines.append('</config>')
+        root = ET.fromstring('\n'.join(lines))
+        start = time.perf_counter()
+        result = convert_xml_to_custom_language(root)
+        elapsed = time.perf_counter() - start
+        if not result.startswith(f'(define {constant_name(0)} {size - 1})'):
+            raise AssertionError(f"Wrong value for {size} constants")
+        print(f"{size:>10} {elapsed * 1e3:>7.0f}ms {elapsed / size * 1e6:>11.2f}us")
+
+
+def bench_batch(file_count, workers, process_limit):
+    """Сравнивает пакетный режим (без пула, с пулом, повтор из кэша) с запуском интерпретатора на каждый файл."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir = os.path.join(temp_dir, 'configs')
+        for i in range(file_count):
+            fragment_dir = os.path.join(input_dir, f'service{i % 100}')
+            os.makedirs(fragment_dir, exist_ok=True)
+            with open(os.path.join(fragment_dir, f'fragment{i}.xml'), 'w', encoding='utf-8') as f:
+                f.write(generate_config(20, 200))
+
+        print(f"{'mode':>22} {'files':>7} {'time':>9} {'files/s':>9}")
+        runs = [
+            ('one process', lambda: translate_batch(input_dir, os.path.join(temp_dir, 'serial'), workers=1)),
+            (f'pool ({workers or os.cpu_count()} workers)',
+             lambda: translate_batch(input_dir, os.path.join(temp_dir, 'pool'), workers=workers)),
+            ('pool, cached', lambda: translate_batch(input_dir, os.path.join(temp_dir, 'pool'), workers=workers)),
+        ]
+        for name, run in runs:
+            totals = run()
+            if totals['failed']:
+                raise AssertionError(f"{totals['failed']} files failed")
+            print(f"{name:>22} {totals['files']:>7} {totals['seconds'] * 1e3:>7.0f}ms "
+                  f"{totals['files'] / totals['seconds']:>9.0f}")
+
+        # Прежний способ: отдельный запуск python config_language.py на каждый файл
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config_language.py')
+        inputs = sorted(Path(input_dir).rglob('*.xml'))[:process_limit]
+        start = time.perf_counter()
+        for input_file in inputs:
+            subprocess.run([sys.executable, script, str(input_file), os.path.join(temp_dir, 'single.txt')], check=True)
+        elapsed = time.perf_counter() - start
+        print(f"{'process per file':>22} {len(inputs):>7} {elapsed * 1e3:>7.0f}ms {len(inputs) / elapsed:>9.0f}")
+
+
+def bench_load(variable_counts, constant_count):
+    """Сравнивает получение модели при старте: перевод XML, разбор текста и загрузка скомпилированной модели."""
+    print(f"{'variables':>10} {'xml':>9} {'text parse':>11} {'model load':>11}")
+    for variable_count in variable_counts:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file = os.path.join(temp_dir, 'input.xml')
+            config_file = os.path.join(temp_dir, 'config.conf')
+            xml_text = generate_config(constant_count, variable_count).replace(
+                '</config>', '    <array><value>1</value><array><value>2</value><value>3</value></array></array>\n'
+                             '</config>')
+            with open(input_file, 'w', encoding='utf-8') as f:
+                f.write(xml_text)
+
+            start = time.perf_counter()
+            text = convert_xml_to_custom_language(ET.parse(input_file).getroot())
+            xml_time = time.perf_counter() - start
+            with open(config_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+            start = time.perf_counter()
+            with open(config_file, encoding='utf-8') as f:
+                parsed = parse_config(f.read())
+            parse_time = time.perf_counter() - start
+
+            load_config(config_file)  # Компиляция модели
+            start = time.perf_counter()
+            loaded = load_config(config_file)
+            load_time = time.perf_counter() - start
+            if loaded != parsed:
+                raise AssertionError(f"Models differ for {variable_count} variables")
+        print(f"{variable_count:>10} {xml_time * 1e3:>7.0f}ms {parse_time * 1e3:>9.0f}ms {load_time * 1e3:>9.1f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Config language translator benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    substitute_parser = subparsers.add_parser('substitute', help='Single-pass constant substitution vs re.sub per constant')
+    substitute_parser.add_argument('--constants', type=int, nargs='+', default=[10, 1_000, 10_000],
+                                   help='Number of constants in the generated configs')
+    substitute_parser.add_argument('--variables', type=int, default=100_000,
+                                   help='Number of variables referencing the constants')
+    substitute_parser.add_argument('--legacy-limit', type=int, default=1_000_000,
+                                   help='Largest constants x lines product on which to run the old implementation')
+
+    stream_parser = subparsers.add_parser('stream', help='Streaming iterparse translation vs whole-tree translation')
+    stream_parser.add_argument('--variables', type=int, nargs='+', default=[100_000, 1_000_000],
+                               help='Number of variables in the generated configs')
+    stream_parser.add_argument('--constants', type=int, default=1_000,
+                               help='Number of constants defined before the variables')
+
+    resolve_parser = subparsers.add_parser('resolve', help='Dependency-ordered evaluation of chained constants')
+    resolve_parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                                help='Length of the constant reference chain')
+
+    load_parser = subparsers.add_parser('load', help='Startup: XML translation vs parsing the text vs the compiled model')
+    load_parser.add_argument('--variables', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                             help='Number of variables in the generated configs')
+    load_parser.add_argument('--constants', type=int, default=1_000,
+                             help='Number of constants defined before the variables')
+
+    batch_parser = subparsers.add_parser('batch', help='Batch translation in a process pool vs a process per file')
+    batch_parser.add_argument('--files', type=int, default=5_000, help='Number of generated config fragments')
+    batch_parser.add_argument('--workers', type=int, help='Pool size (default: number of CPUs)')
+    batch_parser.add_argument('--process-limit', type=int, default=200,
+                              help='Number of files to translate with a separate interpreter each')
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'substitute':
+        bench_substitute(args.constants, args.variables, args.legacy_limit)
+    elif args.benchmark == 'resolve':
+        bench_resolve(args.sizes)
+    elif args.benchmark == 'load':
+        bench_load(args.variables, args.constants)
+    elif args.benchmark == 'stream':
+        bench_stream(args.variables, args.constants)
+    else:
+        bench_batch(args.files, args.workers, args.process_limit)
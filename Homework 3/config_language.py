@@ -1,6 +1,17 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
 import sys
+import time
 import xml.etree.ElementTree as ET
 import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+CONSTANT_REFERENCE = re.compile(r'\$\(([A-Z_]+)\)')  # Ссылка на константу: $(ИМЯ)
+BATCH_CACHE_VERSION = 4  # Меняется вместе с правилами перевода, чтобы сбросить кэш пакетного режима
 
 
 class ConfigSyntaxError(Exception):
@@ -22,44 +33,477 @@ def array_to_string(array_elem):
     return '<< ' + ', '.join(values) + ' >>'
 
 
+def substitute_constants(line, constants):
+    """Заменяет $(ИМЯ) значениями констант за один проход по строке.
+
+    Неизвестные константы остаются как есть, подставленные значения
+    повторно не просматриваются.
+    """
+    if '$(' not in line:
+        return line
+    return CONSTANT_REFERENCE.sub(lambda match: constants.get(match.group(1), match.group(0)), line)
+
+
+EXPRESSION_TOKEN = re.compile(r'\s*(?:(\d+(?:\.\d+)?)|\$\(([A-Z_]+)\)|([-+*/()]))')  # Число, $(ИМЯ) или знак
+MAX_EXPRESSION_DEPTH = 100  # Уровней скобок и унарных знаков в выражении константы
+
+
+class NotArithmetic(Exception):
+    """Значение константы не является арифметическим выражением над числами."""
+
+
+def tokenize_expression(text):
+    """Лексемы выражения: ('number', число), ('ref', имя) или ('op', знак); None, если это не выражение.
+
+    Бинарный знак должен быть отделен пробелами с обеих сторон ($(A) + 1):
+    $(YEAR)-$(MONTH) или $(MIN)-$(MAX) - текст, а не вычитание. Числа с
+    ведущими нулями (007, 01.5) выражением не считаются.
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    space_required = False  # После бинарного знака нужен пробел
+    while position < len(text):
+        match = EXPRESSION_TOKEN.match(text, position)
+        if match is None:
+            return None
+        spaced = text[position].isspace()
+        if space_required and not spaced:
+            return None
+        space_required = False
+        number, name, operator = match.groups()
+        if number is not None:
+            if len(number) > 1 and number[0] == '0' and number[1] != '.':
+                return None
+            tokens.append(('number', float(number) if '.' in number else int(number)))
+        elif name is not None:
+            tokens.append(('ref', name))
+        else:
+            if operator in '+-*/' and tokens and (tokens[-1][0] != 'op' or tokens[-1][1] == ')'):
+                if not spaced:
+                    return None
+                space_required = True
+            tokens.append(('op', operator))
+        position = match.end()
+    return tokens
+
+
+def evaluate_tokens(tokens, numbers):
+    """Вычисляет выражение с +, -, *, / и скобками; ссылки берутся из numbers.
+
+    Бросает NotArithmetic, если выражение некорректно или ссылается на
+    константу без числового значения, и ConfigSyntaxError, если скобки и
+    унарные знаки вложены глубже MAX_EXPRESSION_DEPTH.
+    """
+    position = 0
+    depth = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else (None, None)
+
+    def expression():
+        nonlocal position
+        value = term()
+        while peek() in (('op', '+'), ('op', '-')):
+            operator = tokens[position][1]
+            position += 1
+            value = value + term() if operator == '+' else value - term()
+        return value
+
+    def term():
+        nonlocal position
+        value = factor()
+        while peek() in (('op', '*'), ('op', '/')):
+            operator = tokens[position][1]
+            position += 1
+            value = value * factor() if operator == '*' else value / factor()
+        return value
+
+    def factor():
+        nonlocal position, depth
+        kind, value = peek()
+        position += 1
+        if kind == 'number':
+            return value
+        if kind == 'ref':
+            if value not in numbers:
+                raise NotArithmetic(value)
+            return numbers[value]
+        if kind != 'op' or value not in '-+(':
+            raise NotArithmetic(value)
+        depth += 1
+        if depth > MAX_EXPRESSION_DEPTH:
+            raise ConfigSyntaxError(f"Слишком глубокая вложенность выражения (больше {MAX_EXPRESSION_DEPTH} уровней)")
+        if value == '-':
+            result = -factor()
+        elif value == '+':
+            result = factor()
+        else:
+            result = expression()
+            if peek() != ('op', ')'):
+                raise NotArithmetic(')')
+            position += 1
+        depth -= 1
+        return result
+
+    result = expression()
+    if position != len(tokens):
+        raise NotArithmetic(tokens[position][1])
+    return result
+
+
+def format_number(value):
+    # 15 значащих цифр убирают хвосты двоичной арифметики (0.1 + 0.2 -> 0.3)
+    return str(value) if isinstance(value, int) else format(value, '.15g')
+
+
+def evaluate_constant(name, value, constants, numbers):
+    """Значение константы после подстановки и вычисления.
+
+    Вычисляется только явное арифметическое выражение со ссылками $(ИМЯ)
+    на числовые константы и бинарными знаками, отделенными пробелами
+    ($(A) + 1); значения без ссылок (даты 2024-01-01, диапазоны 8000-8080)
+    остаются в записи из файла, а $(YEAR)-$(MONTH) - текст. Одиночное число со знаком или
+    без становится числовым значением константы. Остальные значения
+    (строки, адреса, ссылки на неизвестные константы) получают текстовую
+    подстановку уже вычисленных констант. numbers пополняется числовыми
+    значениями.
+    """
+    tokens = tokenize_expression(value)
+    if tokens:
+        literal = tokens[-1][0] == 'number' and (
+            len(tokens) == 1 or len(tokens) == 2 and tokens[0] in (('op', '-'), ('op', '+')))
+        if literal:
+            numbers[name] = -tokens[-1][1] if tokens[0] == ('op', '-') else tokens[-1][1]
+            return value
+        if any(kind == 'ref' for kind, _ in tokens):
+            try:
+                number = evaluate_tokens(tokens, numbers)
+            except NotArithmetic:
+                pass
+            except ZeroDivisionError:
+                raise ConfigSyntaxError(f"Деление на ноль в константе {name}: {value}") from None
+            except ConfigSyntaxError as e:
+                raise ConfigSyntaxError(f"Константа {name}: {e}") from None
+            else:
+                numbers[name] = number
+                return format_number(number)
+    return substitute_constants(value, constants)
+
+
+def dependency_order(references):
+    """Топологический порядок констант: каждая идет после тех, на которые ссылается.
+
+    references - имя -> имена констант из той же группы определений.
+    Обход в глубину без рекурсии, линейный по числу определений и ссылок;
+    цикл - ошибка ConfigSyntaxError с путем по циклу.
+    """
+    order = []
+    state = {}  # Имя -> 1, пока константа в обходе, 2 - когда обработана
+    for start in references:
+        if start in state:
+            continue
+        state[start] = 1
+        stack = [(start, iter(references[start]))]
+        while stack:
+            name, children = stack[-1]
+            for child in children:
+                child_state = state.get(child)
+                if child_state == 1:
+                    path = [entry[0] for entry in stack]
+                    cycle = path[path.index(child):] + [child]
+                    raise ConfigSyntaxError(f"Циклическая зависимость констант: {' -> '.join(cycle)}")
+                if child_state is None:
+                    state[child] = 1
+                    stack.append((child, iter(references[child])))
+                    break
+            else:
+                stack.pop()
+                state[name] = 2
+                order.append(name)
+    return order
+
+
+def resolve_constants(definitions, constants=None, numbers=None):
+    """Вычисляет константы в порядке зависимостей, каждую один раз.
+
+    definitions - имя -> значение из файла. constants и numbers - уже
+    вычисленные константы (текст и числа), на которые могут ссылаться
+    определения; они пополняются и возвращаются как (constants, numbers).
+    """
+    constants = {} if constants is None else constants
+    numbers = {} if numbers is None else numbers
+    references = {
+        name: [reference for reference in CONSTANT_REFERENCE.findall(value) if reference in definitions]
+        for name, value in definitions.items()
+    }
+    for name in dependency_order(references):
+        constants[name] = evaluate_constant(name, definitions[name], constants, numbers)
+    return constants, numbers
+
+
+def constant_definition(elem):
+    """Имя и значение константы из элемента <constant> с проверкой имени."""
+    const_name = elem.get('name')
+    if not is_valid_name(const_name):
+        raise ConfigSyntaxError(f"Неверное имя константы: {const_name}")
+    return const_name, elem.text.strip()
+
+
+def element_to_line(elem, constants):
+    """Переводит элемент верхнего уровня в строку; constants - уже вычисленные константы."""
+    if elem.tag == 'variable':
+        var_name = elem.get('name')
+        var_value = elem.text.strip()
+        if not is_valid_name(var_name):
+            raise ConfigSyntaxError(f"Неверное имя переменной: {var_name}")
+        return substitute_constants(f"var {var_name} := {var_value};", constants)
+    elif elem.tag == 'array':
+        return substitute_constants(array_to_string(elem), constants)
+    elif elem.tag == 'constant':
+        const_name = constant_definition(elem)[0]
+        return f"(define {const_name} {constants[const_name]})"
+    else:
+        raise ConfigSyntaxError(f"Неизвестный элемент: {elem.tag}")
+
+
 def convert_xml_to_custom_language(xml_root):
-    result = []
+    """Переводит дерево XML; константы можно использовать и выше их определения."""
+    definitions = {}
+    for elem in xml_root:
+        if elem.tag == 'constant':
+            const_name, const_value = constant_definition(elem)
+            if const_name in definitions:
+                raise ConfigSyntaxError(f"Константа {const_name} определена повторно")
+            definitions[const_name] = const_value
+    constants = resolve_constants(definitions)[0]
+    return '\n'.join(element_to_line(elem, constants) for elem in xml_root)
+
+
+def iter_custom_language(source):
+    """Переводит XML потоком (iterparse): выдает строки по мере чтения элементов.
+
+    Обработанные элементы удаляются из дерева, поэтому в памяти остаются
+    только текущий элемент верхнего уровня и таблица констант. Константа
+    подставляется, только если определена выше по файлу; ссылка на
+    константу, определенную ниже, - ошибка ConfigSyntaxError (строка с ней
+    уже выдана). Ссылки на нигде не определенные константы остаются как есть.
+    """
     constants = {}
+    numbers = {}
+    pending = {}  # Имя еще не определенной константы -> номер первой строки со ссылкой на нее
+    depth = 0
+    root = None
+    line_number = 0
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        line_number += 1
+        if elem.tag == 'constant':
+            const_name, const_value = constant_definition(elem)
+            if const_name in pending:
+                raise ConfigSyntaxError(f"Константа {const_name} используется до определения "
+                                        f"(строка {pending[const_name]})")
+            if const_name in constants:
+                raise ConfigSyntaxError(f"Константа {const_name} определена повторно")
+            resolve_constants({const_name: const_value}, constants, numbers)
+        line = element_to_line(elem, constants)
+        if '$(' in line:
+            # После подстановки остаются только ссылки на еще не определенные константы
+            for name in CONSTANT_REFERENCE.findall(line):
+                pending.setdefault(name, line_number)
+        root.clear()  # Убираем обработанный элемент из корня
+        yield line
 
-    for elem in xml_root:
-        if elem.tag == 'variable':
-            var_name = elem.get('name')
-            var_value = elem.text.strip()
-            if not is_valid_name(var_name):
-                raise ConfigSyntaxError(f"Неверное имя переменной: {var_name}")
-            result.append(f"var {var_name} := {var_value};")
-        elif elem.tag == 'array':
-            result.append(array_to_string(elem))
-        elif elem.tag == 'constant':
-            const_name = elem.get('name')
-            const_value = elem.text.strip()
-            if not is_valid_name(const_name):
-                raise ConfigSyntaxError(f"Неверное имя константы: {const_name}")
-            result.append(f"(define {const_name} {const_value})")
-            constants[const_name] = const_value
+
+def translate_file(input_file, output_file):
+    """Переводит файл потоком, записывая строки сразу в выходной файл.
+
+    Вывод пишется во временный файл рядом с output_file и заменяет его
+    только после успешного перевода. Возвращает число строк.
+    """
+    temp_file = f'{output_file}.{os.getpid()}.tmp'
+    count = 0
+    # Входной файл открывается первым: если его нет, ошибка называет его, а не временный файл
+    with open(input_file, 'rb') as source:
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                for line in iter_custom_language(source):
+                    f.write(f'\n{line}' if count else line)
+                    count += 1
+            os.replace(temp_file, output_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+    return count
+
+
+def write_atomically(output_file, text):
+    temp_file = f'{output_file}.{os.getpid()}.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_file, output_file)
+
+
+def find_batch_inputs(pattern):
+    """Файлы пакета и базовый каталог: все *.xml каталога или файлы по glob-шаблону.
+
+    Базовый каталог - часть шаблона до первого компонента со спецсимволами;
+    пути выходных файлов строятся относительно него.
+    """
+    if os.path.isdir(pattern):
+        return Path(pattern), sorted(path for path in Path(pattern).rglob('*.xml') if path.is_file())
+    parts = Path(pattern).parts
+    base_parts = []
+    for part in parts[:-1]:
+        if glob.has_magic(part):
+            break
+        base_parts.append(part)
+    base = Path(*base_parts) if base_parts else Path('.')
+    return base, sorted(Path(path) for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+
+def translate_batch_file(job):
+    """Переводит один файл пакета (выполняется в процессе пула).
+
+    job - (входной файл, выходной файл, хэш из кэша или None). Файл читается
+    один раз: если хэш содержимого совпал с кэшем, а вывод на месте, перевод
+    пропускается. Возвращает (статус, хэш, число строк, размер входа,
+    сообщение об ошибке); статус - 'translated', 'cached' или 'failed'.
+    """
+    input_file, output_file, cached_hash = job
+    try:
+        with open(input_file, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return 'failed', None, 0, 0, f"Ошибка: {e}"
+    content_hash = hashlib.blake2b(data, digest_size=20).hexdigest()
+    if content_hash == cached_hash and os.path.exists(output_file):
+        return 'cached', content_hash, 0, len(data), None
+    try:
+        result = convert_xml_to_custom_language(ET.fromstring(data))
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        write_atomically(output_file, result)
+    except ET.ParseError as e:
+        return 'failed', content_hash, 0, len(data), f"Ошибка при разборе XML: {e}"
+    except ConfigSyntaxError as e:
+        return 'failed', content_hash, 0, len(data), f"Ошибка синтаксиса: {e}"
+    except Exception as e:
+        return 'failed', content_hash, 0, len(data), f"Ошибка: {e}"
+    return 'translated', content_hash, result.count('\n') + 1 if result else 0, len(data), None
+
+
+def load_batch_cache(cache_path):
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != BATCH_CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+
+def translate_batch(pattern, output_dir, workers=None, cache_path=None):
+    """Переводит пакет файлов в пуле процессов; возвращает итоги.
+
+    Выход для base/a/b.xml - output_dir/a/b.txt. Кэш (по умолчанию
+    output_dir/.config_cache.json) хранит для каждого входного файла хэш
+    содержимого и путь вывода; совпавшие файлы не переводятся повторно.
+    Ошибки отдельных файлов собираются в итогах и не прерывают пакет.
+    """
+    start = time.perf_counter()
+    output_dir = Path(output_dir)
+    cache_path = Path(cache_path) if cache_path else output_dir / '.config_cache.json'
+    base, inputs = find_batch_inputs(pattern)
+    cache = load_batch_cache(cache_path)
+
+    jobs = []
+    for input_file in inputs:
+        output_file = str(output_dir / input_file.relative_to(base).with_suffix('.txt'))
+        entry = cache.get(str(input_file))
+        cached_hash = entry['hash'] if entry and entry['output'] == output_file else None
+        jobs.append((str(input_file), output_file, cached_hash))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        results = list(map(translate_batch_file, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Мелкие файлы отправляются в процессы пачками, чтобы не платить за передачу каждого
+            chunksize = max(1, len(jobs) // (workers * 4))
+            results = list(executor.map(translate_batch_file, jobs, chunksize=chunksize))
+
+    totals = {'files': len(jobs), 'translated': 0, 'cached': 0, 'failed': 0, 'lines': 0, 'bytes': 0, 'errors': []}
+    for (input_file, output_file, _), (status, content_hash, lines, size, error) in zip(jobs, results):
+        totals[status] += 1
+        totals['lines'] += lines
+        totals['bytes'] += size
+        if status == 'failed':
+            totals['errors'].append((input_file, error))
+            cache.pop(input_file, None)
         else:
-            raise ConfigSyntaxError(f"Неизвестный элемент: {elem.tag}")
+            cache[input_file] = {'hash': content_hash, 'output': output_file}
 
-    for i, line in enumerate(result):
-        for const_name, const_value in constants.items():
-            line = re.sub(r'\$\(' + re.escape(const_name) + r'\)', const_value, line)
-        result[i] = line
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomically(cache_path, json.dumps({'version': BATCH_CACHE_VERSION, 'files': cache}))
+    totals['seconds'] = time.perf_counter() - start
+    return totals
 
-    return '\n'.join(result)
+
+def print_batch_totals(totals):
+    for input_file, error in totals['errors']:
+        print(f"{input_file}: {error}")
+    seconds = totals['seconds']
+    print(f"Файлов: {totals['files']}, переведено: {totals['translated']}, из кэша: {totals['cached']}, "
+          f"с ошибками: {totals['failed']}")
+    if seconds > 0:
+        print(f"Строк: {totals['lines']}, время: {seconds:.2f} с, "
+              f"{totals['files'] / seconds:.1f} файлов/с, {totals['bytes'] / seconds / 2 ** 20:.2f} МиБ/с")
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Использование: python task_3.py <input_file.xml> <output_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Перевод конфигурации из XML в учебный конфигурационный язык")
+    parser.add_argument("input", help="Входной XML-файл; с --batch - каталог или glob-шаблон")
+    parser.add_argument("output", help="Выходной файл; с --batch - каталог для результатов")
+    parser.add_argument("--stream", action="store_true", help="Потоковый перевод для больших файлов")
+    parser.add_argument("--batch", action="store_true", help="Перевести много файлов в пуле процессов")
+    parser.add_argument("--workers", type=int, help="Число процессов пакетного режима (по умолчанию - число ядер)")
+    parser.add_argument("--cache", help="Файл кэша пакетного режима (по умолчанию - в каталоге результатов)")
+    args = parser.parse_args()
+
+    input_file, output_file = args.input, args.output
+
+    if args.batch:
+        totals = translate_batch(input_file, output_file, args.workers, args.cache)
+        print_batch_totals(totals)
+        if totals['failed']:
+            sys.exit(1)
+        return
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    if args.stream:
+        try:
+            translate_file(input_file, output_file)
+        except FileNotFoundError as e:
+            print(f"Файл {e.filename} не найден.")
+            sys.exit(1)
+        except ET.ParseError:
+            print(f"Ошибка при разборе XML-файла {input_file}.")
+            sys.exit(1)
+        except ConfigSyntaxError as e:
+            print(f"Ошибка синтаксиса: {e}")
+            sys.exit(1)
+        except Exception as e:
+            print(f"Ошибка: {e}")
+            sys.exit(1)
+        return
 
     try:
         tree = ET.parse(input_file)
@@ -0,0 +1,212 @@
+import marshal
+import os
+import re
+import sys
+
+from config_language import ConfigSyntaxError
+
+
+MODEL_MAGIC = b"CFGMDL\x00\x01"  # Сигнатура и версия формата скомпилированной модели
+MODEL_SUFFIX = ".bin"  # Модель лежит рядом с исходником: app.conf -> app.conf.bin
+
+VARIABLE = re.compile(r'var ([A-Z_]+) := (.*);')
+DEFINE = re.compile(r'\(define ([A-Z_]+) (.*)\)')
+ARRAY_TOKEN = re.compile(r'\s*(<<|>>|,)\s*')  # Разделители массива; значения - текст между ними
+# Числа с ведущими нулями (007, 0755) - текст, как и в tokenize_expression
+INTEGER = re.compile(r'[-+]?(?:0|[1-9]\d*)')
+FLOAT = re.compile(r'[-+]?(?:(?:0|[1-9]\d*)\.\d*|\.\d+|(?:0|[1-9]\d*)(?:\.\d*)?[eE][-+]?\d+)')
+
+
+class ConfigModel:
+    """Разобранная конфигурация: переменные, константы и безымянные массивы.
+
+    Значения типизированы: int, float, list для массивов (вложенные -
+    списки в списках) и str для всего остального.
+    """
+
+    def __init__(self, variables=None, constants=None, arrays=None):
+        self.variables = variables if variables is not None else {}
+        self.constants = constants if constants is not None else {}
+        self.arrays = arrays if arrays is not None else []
+
+    def __eq__(self, other):
+        return isinstance(other, ConfigModel) and self.to_tables() == other.to_tables()
+
+    def __repr__(self):
+        return (f"ConfigModel(variables={len(self.variables)}, constants={len(self.constants)}, "
+                f"arrays={len(self.arrays)})")
+
+    def to_tables(self):
+        return self.variables, self.constants, self.arrays
+
+    @classmethod
+    def from_tables(cls, tables):
+        variables, constants, arrays = tables
+        if not (isinstance(variables, dict) and isinstance(constants, dict) and isinstance(arrays, list)):
+            raise ValueError('Unexpected model tables')
+        return cls(variables, constants, arrays)
+
+
+def parse_scalar(text):
+    if INTEGER.fullmatch(text):
+        return int(text)
+    if FLOAT.fullmatch(text):
+        return float(text)
+    return text
+
+
+def parse_array(text, line_number=0):
+    """Разбирает << a, b, << c >> >> в список; значения приводятся к int/float."""
+    parts = ARRAY_TOKEN.split(text.strip())
+    # split с группой дает чередование: значение, разделитель, значение, ...
+    stack = []
+    current = None
+    result = None
+    expect_value = False
+    for index, part in enumerate(parts):
+        if index % 2 == 0:
+            if part:
+                if current is None or not expect_value:
+                    raise ConfigSyntaxError(f"Строка {line_number}: значение вне массива: {part}")
+                current.append(parse_scalar(part))
+                expect_value = False
+            continue
+        if part == '<<':
+            array = []
+            if current is not None:
+                if not expect_value:
+                    raise ConfigSyntaxError(f"Строка {line_number}: пропущена запятая перед массивом")
+                current.append(array)
+                stack.append(current)
+            elif result is not None:
+                raise ConfigSyntaxError(f"Строка {line_number}: лишние символы после массива")
+            else:
+                result = array
+            current = array
+            expect_value = True
+        elif part == '>>':
+            if current is None:
+                raise ConfigSyntaxError(f"Строка {line_number}: лишний >>")
+            if expect_value and current:
+                raise ConfigSyntaxError(f"Строка {line_number}: лишняя запятая")
+            current = stack.pop() if stack else None
+            expect_value = False
+        else:  # Запятая
+            if current is None or expect_value:
+                raise ConfigSyntaxError(f"Строка {line_number}: лишняя запятая")
+            expect_value = True
+    if current is not None or result is None:
+        raise ConfigSyntaxError(f"Строка {line_number}: незакрытый массив")
+    return result
+
+
+def parse_value(text, line_number=0):
+    return parse_array(text, line_number) if text.startswith('<<') else parse_scalar(text)
+
+
+def parse_config(text):
+    """Разбирает текст на конфигурационном языке (вывод config_language) в ConfigModel.
+
+    Каждая инструкция занимает строку: var ИМЯ := значение;, (define ИМЯ
+    значение) или массив << ... >>. Пустые строки пропускаются.
+    """
+    model = ConfigModel()
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        first = line[0]
+        if first == 'v':
+            match = VARIABLE.fullmatch(line)
+            if match:
+                model.variables[match.group(1)] = parse_value(match.group(2), line_number)
+                continue
+        elif first == '(':
+            match = DEFINE.fullmatch(line)
+            if match:
+                model.constants[match.group(1)] = parse_value(match.group(2), line_number)
+                continue
+        elif first == '<':
+            model.arrays.append(parse_array(line, line_number))
+            continue
+        raise ConfigSyntaxError(f"Строка {line_number}: неизвестная инструкция: {line}")
+    return model
+
+
+def model_path(config_path):
+    """Путь к скомпилированной модели для файла конфигурации."""
+    return config_path + MODEL_SUFFIX
+
+
+def source_key(config_path):
+    """Ключ актуальности модели: размер и mtime исходного файла."""
+    stat = os.stat(config_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def read_model(config_path, key):
+    """Читает модель одним чтением; None, если ее нет, она устарела или повреждена."""
+    try:
+        with open(model_path(config_path), 'rb') as model_file:
+            data = model_file.read()
+        if not data.startswith(MODEL_MAGIC):
+            return None
+        stored_key, tables = marshal.loads(memoryview(data)[len(MODEL_MAGIC):])
+        if stored_key != key:
+            return None
+        # Модель другой формы (старый формат, обрезанный кортеж) пересобирается, как и поврежденная
+        return ConfigModel.from_tables(tables)
+    except (OSError, EOFError, ValueError, TypeError, KeyError, IndexError):
+        return None
+
+
+def write_model(config_path, key, model):
+    """Атомарно записывает модель; ошибки записи (например, нет прав) не фатальны."""
+    path = model_path(config_path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as model_file:
+            model_file.write(MODEL_MAGIC + marshal.dumps((key, model.to_tables())))
+        os.replace(temp_path, path)
+        return True
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+
+def load_config(config_path):
+    """Модель конфигурации: из скомпилированного файла, если он актуален, иначе разбором текста."""
+    key = source_key(config_path)
+    model = read_model(config_path, key)
+    if model is None:
+        with open(config_path, encoding='utf-8') as f:
+            model = parse_config(f.read())
+        write_model(config_path, key, model)
+    return model
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Использование: python config_model.py <config_file> [...]")
+        sys.exit(1)
+
+    for config_path in sys.argv[1:]:
+        try:
+            key = source_key(config_path)
+            with open(config_path, encoding='utf-8') as f:
+                model = parse_config(f.read())
+        except FileNotFoundError:
+            print(f"Файл {config_path} не найден.")
+            sys.exit(1)
+        except ConfigSyntaxError as e:
+            print(f"Ошибка синтаксиса в {config_path}: {e}")
+            sys.exit(1)
+        if not write_model(config_path, key, model):
+            print(f"Не удалось записать {model_path(config_path)}")
+            sys.exit(1)
+        print(f"{config_path} -> {model_path(config_path)}: {model!r}")
+
+
+if __name__ == "__main__":
+    main()
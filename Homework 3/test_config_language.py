@@ -1,5 +1,9 @@
+import marshal
+import os
+import tempfile
 import xml.etree.ElementTree as ET
-from config_language import convert_xml_to_custom_language, ConfigSyntaxError
+from config_language import convert_xml_to_custom_language, translate_batch, translate_file, ConfigSyntaxError
+from config_model import MODEL_MAGIC, ConfigModel, load_config, model_path, parse_config, source_key
 
 def run_test(test_input, expected_output):
     """Запускает тест и выводит результат."""
@@ -8,6 +12,19 @@ def run_test(test_input, expected_output):
     assert result == expected_output, f"Ошибка: ожидалось '{expected_output}', получено '{result}'"
     print(f"Тест прошел: {result}")
 
+def run_stream_test(test_input, expected_output):
+    """Переводит XML из временного файла потоком и сравнивает выходной файл."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_file = os.path.join(temp_dir, 'input.xml')
+        output_file = os.path.join(temp_dir, 'output.txt')
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write(test_input)
+        translate_file(input_file, output_file)
+        with open(output_file, encoding='utf-8') as f:
+            result = f.read()
+    assert result == expected_output, f"Ошибка: ожидалось '{expected_output}', получено '{result}'"
+    print(f"Потоковый тест прошел: {result}")
+
 def main():
     try:
         # Тест 1: Одна переменная
@@ -97,6 +114,170 @@ def main():
         expected_nested_output = "<< 1, 2, << 3, 4, << 5 >> >> >>"
         run_test(nested_array_config, expected_nested_output)
 
+        # Тест 8: Несколько констант в строке, неизвестная константа и обратная косая черта в значении
+        substitution_config = r'''<root>
+            <constant name="HOST">localhost</constant>
+            <constant name="PATH_SEP">\</constant>
+            <variable name="URL">$(HOST)$(PATH_SEP)$(PORT)</variable>
+        </root>'''
+        run_test(substitution_config, "(define HOST localhost)\n(define PATH_SEP \\)\nvar URL := localhost\\$(PORT);")
+
+        # Тест 9: Потоковый перевод совпадает с обычным
+        run_stream_test(computation_config, "(define EULER_NUMBER 2.718)\nvar E_VAR := 2.718;\n<< 10, 20, 30 >>")
+        run_stream_test(nested_array_config, expected_nested_output)
+
+        # Тест 10: Константа используется до определения при потоковом переводе
+        forward_reference_config = '''<root>
+            <variable name="PORT_VAR">$(DEFAULT_PORT)</variable>
+            <constant name="DEFAULT_PORT">8080</constant>
+        </root>'''
+        try:
+            run_stream_test(forward_reference_config, "")
+            raise AssertionError("Ошибка: ссылка до определения константы не обнаружена")
+        except ConfigSyntaxError as e:
+            print(f"Тест на константу до определения прошел: {e}")
+
+        # Тест 11: Нет входного файла - ошибка называет его, выходной каталог не трогается
+        with tempfile.TemporaryDirectory() as temp_dir:
+            missing_file = os.path.join(temp_dir, 'missing.xml')
+            try:
+                translate_file(missing_file, os.path.join(temp_dir, 'output.txt'))
+                raise AssertionError("Ошибка: отсутствующий входной файл не обнаружен")
+            except FileNotFoundError as e:
+                assert e.filename == missing_file, f"Ошибка: в сообщении {e.filename} вместо {missing_file}"
+            assert not os.listdir(temp_dir), f"Ошибка: остались файлы {os.listdir(temp_dir)}"
+            print("Тест на отсутствующий входной файл прошел")
+
+        # Тест 12: Пакетный перевод с ошибкой в одном файле и повторный запуск из кэша
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_dir = os.path.join(temp_dir, 'configs')
+            os.makedirs(os.path.join(input_dir, 'network'))
+            fragments = {'computation.xml': computation_config,
+                         os.path.join('network', 'ports.xml'): network_config,
+                         'invalid.xml': xml_input_5}
+            for name, text in fragments.items():
+                with open(os.path.join(input_dir, name), 'w', encoding='utf-8') as f:
+                    f.write(text)
+            output_dir = os.path.join(temp_dir, 'output')
+            totals = translate_batch(input_dir, output_dir, workers=2)
+            assert (totals['translated'], totals['failed']) == (2, 1), f"Ошибка: {totals}"
+            assert 'InvalidName' in totals['errors'][0][1], f"Ошибка: {totals['errors']}"
+            with open(os.path.join(output_dir, 'network', 'ports.txt'), encoding='utf-8') as f:
+                assert f.read().startswith("(define DEFAULT_PORT 8080)")
+            totals = translate_batch(input_dir, output_dir, workers=2)
+            assert (totals['translated'], totals['cached'], totals['failed']) == (0, 2, 1), f"Ошибка: {totals}"
+            print(f"Тест пакетного перевода прошел: {totals['files']} файла")
+
+        # Тест 13: Вычисление констант, ссылающихся друг на друга в любом порядке
+        expression_config = '''<root>
+            <variable name="AREA_VAR">$(AREA)</variable>
+            <constant name="AREA">$(SIDE) * ($(SIDE) + 1)</constant>
+            <constant name="SIDE">$(BASE) / 4</constant>
+            <constant name="BASE">10</constant>
+            <constant name="ADDRESS">192.168.1.1:$(BASE)</constant>
+        </root>'''
+        run_test(expression_config, "var AREA_VAR := 8.75;\n(define AREA 8.75)\n(define SIDE 2.5)\n(define BASE 10)\n"
+                                    "(define ADDRESS 192.168.1.1:10)")
+
+        # Тест 14: Циклическая зависимость констант
+        cycle_config = '''<root>
+            <constant name="A">$(B) + 1</constant>
+            <constant name="B">$(A) * 2</constant>
+        </root>'''
+        try:
+            run_test(cycle_config, "")
+            raise AssertionError("Ошибка: цикл констант не обнаружен")
+        except ConfigSyntaxError as e:
+            assert "A -> B -> A" in str(e), f"Ошибка: {e}"
+            print(f"Тест на циклическую зависимость прошел: {e}")
+
+        # Тест 15: Вычисляются только явные выражения, числа с ведущими нулями - не числа
+        verbatim_config = '''<root>
+            <constant name="RELEASE_DATE">2024-01-01</constant>
+            <constant name="PORT_RANGE">8000-8080</constant>
+            <constant name="CODE">007</constant>
+            <constant name="NEXT_CODE">$(CODE) + 1</constant>
+            <variable name="RANGE_VAR">$(PORT_RANGE)</variable>
+        </root>'''
+        run_test(verbatim_config, "(define RELEASE_DATE 2024-01-01)\n(define PORT_RANGE 8000-8080)\n(define CODE 007)\n"
+                                  "(define NEXT_CODE 007 + 1)\nvar RANGE_VAR := 8000-8080;")
+        # Знак без пробелов между ссылками - текст (дата, диапазон), с пробелами - вычитание
+        reference_text_config = '''<root>
+            <constant name="YEAR">2024</constant>
+            <constant name="MONTH">12</constant>
+            <constant name="DATE">$(YEAR)-$(MONTH)</constant>
+            <constant name="MIN_PORT">8000</constant>
+            <constant name="MAX_PORT">8080</constant>
+            <constant name="PORTS">$(MIN_PORT)-$(MAX_PORT)</constant>
+            <constant name="HALF_OPEN">$(MIN_PORT) -$(MAX_PORT)</constant>
+            <constant name="PORT_COUNT">$(MAX_PORT) - $(MIN_PORT) + 1</constant>
+            <constant name="NEGATIVE">-$(MONTH) * (-1 + $(MONTH))</constant>
+        </root>'''
+        run_test(reference_text_config, "(define YEAR 2024)\n(define MONTH 12)\n(define DATE 2024-12)\n"
+                                        "(define MIN_PORT 8000)\n(define MAX_PORT 8080)\n(define PORTS 8000-8080)\n"
+                                        "(define HALF_OPEN 8000 -8080)\n(define PORT_COUNT 81)\n"
+                                        "(define NEGATIVE -132)")
+
+        # Тест 16: Слишком глубокая вложенность скобок - ошибка синтаксиса, а не переполнение стека
+        deep_config = f'''<root>
+            <constant name="BASE">1</constant>
+            <constant name="DEEP">{'(' * 10000}$(BASE){')' * 10000}</constant>
+        </root>'''
+        try:
+            run_test(deep_config, "")
+            raise AssertionError("Ошибка: глубокая вложенность не обнаружена")
+        except ConfigSyntaxError as e:
+            print(f"Тест на глубокую вложенность прошел: {e}")
+
+        # Тест 17: Обратный разбор вывода в типизированную модель
+        model = parse_config(convert_xml_to_custom_language(ET.fromstring(nested_array_config)) + '\n' +
+                             convert_xml_to_custom_language(ET.fromstring(expression_config)))
+        expected_model = ConfigModel({'AREA_VAR': 8.75}, {'AREA': 8.75, 'SIDE': 2.5, 'BASE': 10,
+                                                          'ADDRESS': '192.168.1.1:10'}, [[1, 2, [3, 4, [5]]]])
+        assert model == expected_model, f"Ошибка: получено {model.to_tables()}"
+        # Числа с ведущими нулями остаются текстом и после обратного разбора
+        zeros_config = '''<root>
+            <constant name="CODE">007</constant>
+            <variable name="V">0755</variable>
+            <array><value>00</value><value>0</value><value>0.5</value><value>01.5</value></array>
+        </root>'''
+        zeros_model = parse_config(convert_xml_to_custom_language(ET.fromstring(zeros_config)))
+        assert zeros_model == ConfigModel({'V': '0755'}, {'CODE': '007'}, [['00', 0, 0.5, '01.5']]), \
+            f"Ошибка: получено {zeros_model.to_tables()}"
+        for invalid_text in ("<< 1, >>", "<< 1 << 2 >> >>", "<< 1", "var x := 1;"):
+            try:
+                parse_config(invalid_text)
+                raise AssertionError(f"Ошибка: '{invalid_text}' разобран без ошибки")
+            except ConfigSyntaxError:
+                pass
+        print(f"Тест обратного разбора прошел: {model.to_tables()}")
+
+        # Тест 18: Скомпилированная модель загружается из файла и обновляется при изменении исходника
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_path = os.path.join(temp_dir, 'app.conf')
+            with open(config_path, 'w', encoding='utf-8') as f:
+                f.write("var PORT := 8080;\n(define HOST localhost)")
+            assert load_config(config_path).variables == {'PORT': 8080}
+            assert os.path.exists(model_path(config_path)), "Ошибка: модель не записана"
+            assert load_config(config_path).constants == {'HOST': 'localhost'}
+            with open(config_path, 'w', encoding='utf-8') as f:
+                f.write("var V := 0755;\n(define CODE 007)\n")
+            os.utime(config_path, ns=(1, 1))
+            load_config(config_path)
+            assert load_config(config_path).to_tables() == ({'V': '0755'}, {'CODE': '007'}, []), \
+                "Ошибка: ведущие нули потеряны в модели"
+            with open(config_path, 'w', encoding='utf-8') as f:
+                f.write("var PORT := 9090;\n(define HOST localhost)\n")
+            os.utime(config_path, ns=(0, 0))
+            assert load_config(config_path).variables == {'PORT': 9090}, "Ошибка: устаревшая модель"
+            # Модель, которая читается marshal, но имеет другую форму, пересобирается из текста
+            key = source_key(config_path)
+            for tables in ((), ({'PORT': 1},), (1, 2, 3)):
+                with open(model_path(config_path), 'wb') as f:
+                    f.write(MODEL_MAGIC + marshal.dumps((key, tables)))
+                assert load_config(config_path).variables == {'PORT': 9090}, f"Ошибка: модель {tables}"
+            print("Тест скомпилированной модели прошел")
+
         print("Все тесты выполнены успешно!")
 
     except Exception as e: